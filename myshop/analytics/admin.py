@@ -0,0 +1,35 @@
+"""
+Admin configuration for the analytics application.
+The daily rollups are read-only; they link to the sales dashboard.
+"""
+
+from django.contrib import admin
+
+from .models import DailyProductSales, DailySales
+
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(ReadOnlyAdmin):
+    list_display = [
+        'date', 'orders', 'revenue', 'discount',
+        'coupon_orders', 'items_sold', 'updated'
+    ]
+    date_hierarchy = 'date'
+    change_list_template = 'admin/analytics/dailysales/change_list.html'
+
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(ReadOnlyAdmin):
+    list_display = ['date', 'product_name', 'quantity', 'revenue']
+    date_hierarchy = 'date'
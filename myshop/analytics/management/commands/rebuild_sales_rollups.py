@@ -0,0 +1,81 @@
+"""
+Rebuild the daily sales rollups for a range of days, e.g. to backfill
+the history of orders placed before the rollups existed. Days old enough
+to have archived orders are left as they are.
+
+Usage:
+    python manage.py rebuild_sales_rollups --from 2025-01-01 --to 2026-01-01
+    python manage.py rebuild_sales_rollups --days 7
+"""
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from analytics.rollups import rollup_day
+from orders.archive import archive_cutoff
+from orders.models import Order
+
+
+def parse_day(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD.')
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales rollups used by the sales dashboard.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from',
+            dest='day_from',
+            type=parse_day,
+            help='First day to rebuild (YYYY-MM-DD). Defaults to the first order.'
+        )
+        parser.add_argument(
+            '--to',
+            dest='day_to',
+            type=parse_day,
+            help='Day to stop before (YYYY-MM-DD). Defaults to tomorrow.'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Rebuild only the last N days.'
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        day_to = options['day_to'] or today + datetime.timedelta(days=1)
+        if options['days']:
+            day_from = day_to - datetime.timedelta(days=options['days'])
+        elif options['day_from']:
+            day_from = options['day_from']
+        else:
+            first = Order.objects.filter(paid=True).order_by('created').first()
+            if first is None:
+                self.stdout.write('No paid orders to roll up.')
+                return
+            day_from = timezone.localdate(first.created)
+
+        # Archived orders are no longer in the order table: keep the rollups
+        # of the days they were archived from
+        first_live_day = timezone.localdate(archive_cutoff()) + datetime.timedelta(days=1)
+        if day_from < first_live_day:
+            self.stdout.write(self.style.WARNING(
+                f'Days before {first_live_day} may have archived orders and are kept.'
+            ))
+            day_from = first_live_day
+
+        day = day_from
+        count = 0
+        while day < day_to:
+            rollup_day(day)
+            day += datetime.timedelta(days=1)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt sales rollups for {count} days from {day_from} to {day_to}'
+        ))
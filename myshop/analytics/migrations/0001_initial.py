@@ -0,0 +1,49 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('shop', '0005_product_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('discount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('coupon_orders', models.PositiveIntegerField(default=0)),
+                ('items_sold', models.PositiveIntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'daily sales',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('product_name', models.CharField(max_length=200)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='shop.product')),
+            ],
+            options={
+                'verbose_name_plural': 'daily product sales',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'product'), name='unique_daily_product_sales')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+"""
+Models for the analytics application.
+Daily rollups of paid orders that back the sales dashboard.
+"""
+from django.db import models
+
+# ==============================================================================
+# DAILY ROLLUPS
+# ==============================================================================
+
+class DailySales(models.Model):
+    """
+    Sales totals of the orders paid on one day (by order creation date).
+    Rebuilt for a day by analytics.rollups.rollup_day.
+    """
+    date = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    coupon_orders = models.PositiveIntegerField(default=0)
+    items_sold = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = 'daily sales'
+
+    def __str__(self):
+        return f'Sales {self.date}'
+
+
+class DailyProductSales(models.Model):
+    """
+    Units sold and revenue of one product on one day.
+    """
+    date = models.DateField()
+    product = models.ForeignKey(
+        'shop.Product',
+        related_name='daily_sales',
+        on_delete=models.CASCADE
+    )
+    product_name = models.CharField(max_length=200)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = 'daily product sales'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'product'],
+                name='unique_daily_product_sales'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.product_name} {self.date}'
@@ -0,0 +1,146 @@
+"""
+Daily sales rollups.
+
+Each day's totals are rebuilt from that day's paid orders with a couple
+of aggregate queries whenever one of its orders is paid, so the rollup
+tables stay current without ever re-aggregating the whole order history.
+The dashboard then groups a few hundred DailySales/DailyProductSales rows
+by day, week or month.
+"""
+
+import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DateField, F, Max, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from .models import DailyProductSales, DailySales
+
+# Number of periods shown on the dashboard for each grouping
+PERIODS = {
+    'day': 30,
+    'week': 12,
+    'month': 12,
+}
+
+
+def day_range(day):
+    """
+    Start and end (exclusive) of a local calendar day as aware datetimes.
+    """
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    return start, start + datetime.timedelta(days=1)
+
+
+def rollup_day(day):
+    """
+    Rebuild the sales rollups of one day from its paid orders.
+    """
+    start, end = day_range(day)
+    # Orders paid after they were cancelled are refunded and not counted
+    orders = Order.objects.filter(
+        paid=True, created__gte=start, created__lt=end
+    ).exclude(status=Order.Status.CANCELLED)
+    items = OrderItem.objects.filter(
+        order__paid=True,
+        order__created__gte=start,
+        order__created__lt=end
+    ).exclude(order__status=Order.Status.CANCELLED)
+
+    with transaction.atomic():
+        # Lock the day so concurrent rollups of it are applied one by one
+        DailySales.objects.get_or_create(date=day)
+        daily = DailySales.objects.select_for_update().get(date=day)
+
+        totals = orders.aggregate(
+            orders=Count('id'),
+            revenue=Sum('total_cost'),
+            discount=Sum('discount_amount'),
+            coupon_orders=Count('id', filter=Q(discount_amount__gt=0)),
+        )
+        lines = list(
+            items.values('product_id').annotate(
+                name=Max('product_name'),
+                units=Sum('quantity'),
+                sales=Sum(F('price') * F('quantity')),
+            ).order_by()
+        )
+
+        daily.orders = totals['orders']
+        daily.revenue = totals['revenue'] or Decimal(0)
+        daily.discount = totals['discount'] or Decimal(0)
+        daily.coupon_orders = totals['coupon_orders']
+        daily.items_sold = sum(line['units'] for line in lines)
+        daily.save()
+
+        DailyProductSales.objects.filter(date=day).delete()
+        DailyProductSales.objects.bulk_create([
+            DailyProductSales(
+                date=day,
+                product_id=line['product_id'],
+                product_name=line['name'],
+                quantity=line['units'],
+                revenue=line['sales'],
+            )
+            for line in lines
+        ])
+    return daily
+
+
+# ==============================================================================
+# DASHBOARD QUERIES
+# ==============================================================================
+
+def period_start(period, today=None):
+    """
+    First day of the oldest period shown for a grouping.
+    """
+    today = today or timezone.localdate()
+    count = PERIODS[period]
+    if period == 'day':
+        return today - datetime.timedelta(days=count - 1)
+    if period == 'week':
+        return today - datetime.timedelta(days=today.weekday(), weeks=count - 1)
+    months = today.year * 12 + today.month - 1 - (count - 1)
+    return datetime.date(months // 12, months % 12 + 1, 1)
+
+
+def sales_summary(period, start):
+    """
+    Revenue, order count, average order value and coupon usage per period
+    since `start`, newest first.
+    """
+    rows = DailySales.objects.filter(date__gte=start).annotate(
+        period=Trunc('date', period, output_field=DateField())
+    ).values('period').annotate(
+        orders=Sum('orders'),
+        revenue=Sum('revenue'),
+        discount=Sum('discount'),
+        coupon_orders=Sum('coupon_orders'),
+        items_sold=Sum('items_sold'),
+    ).order_by('-period')
+
+    summary = []
+    for row in rows:
+        row['average_order_value'] = (
+            (row['revenue'] / row['orders']).quantize(Decimal('0.01'))
+            if row['orders'] else Decimal(0)
+        )
+        summary.append(row)
+    return summary
+
+
+def top_products(start, limit=10):
+    """
+    Best selling products by revenue since `start`.
+    """
+    return DailyProductSales.objects.filter(date__gte=start).values(
+        'product_id'
+    ).annotate(
+        product_name=Max('product_name'),
+        quantity=Sum('quantity'),
+        revenue=Sum('revenue'),
+    ).order_by('-revenue')[:limit]
@@ -0,0 +1,36 @@
+"""
+Asynchronous tasks for the analytics application.
+Keeps the daily sales rollups up to date.
+"""
+
+import datetime
+
+from celery import shared_task
+from django.utils import timezone
+
+from orders.models import Order
+from .rollups import rollup_day
+
+# ==============================================================================
+# ASYNCHRONOUS TASKS
+# ==============================================================================
+
+@shared_task
+def update_sales_rollups(order_ids):
+    """
+    Rebuild the rollups of the days of newly paid or cancelled orders.
+    """
+    created = Order.objects.filter(id__in=order_ids).values_list('created', flat=True)
+    for day in sorted({timezone.localdate(value) for value in created}):
+        rollup_day(day)
+
+
+@shared_task
+def rollup_recent_sales():
+    """
+    Periodic task rebuilding today's and yesterday's rollups, picking up
+    orders that were paid or edited outside the payment webhook.
+    """
+    today = timezone.localdate()
+    for day in [today - datetime.timedelta(days=1), today]:
+        rollup_day(day)
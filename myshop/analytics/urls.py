@@ -0,0 +1,14 @@
+"""
+URL routing for the analytics application.
+"""
+from django.urls import path
+from . import views
+app_name = 'analytics'
+
+urlpatterns = [
+    # --------------------------------------------------------------------------
+    # ADMIN / STAFF ROUTES
+    # --------------------------------------------------------------------------
+    # Sales dashboard backed by the daily rollups
+    path('admin/sales/', views.sales_dashboard, name='sales_dashboard'),
+]
@@ -0,0 +1,49 @@
+"""
+Views for the analytics application.
+Staff-only sales dashboard reading the daily rollup tables.
+"""
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import Sum
+from django.shortcuts import render
+
+from .models import DailySales
+from .rollups import PERIODS, period_start, sales_summary, top_products
+
+# ==============================================================================
+# ADMIN & STAFF VIEWS
+# ==============================================================================
+
+@staff_member_required
+def sales_dashboard(request):
+    """
+    Revenue, order count, average order value, coupon usage and top
+    products grouped by day, week or month.
+    """
+    period = request.GET.get('period', 'day')
+    if period not in PERIODS:
+        period = 'day'
+    start = period_start(period)
+
+    summary = sales_summary(period, start)
+    totals = DailySales.objects.filter(date__gte=start).aggregate(
+        orders=Sum('orders'),
+        revenue=Sum('revenue'),
+        discount=Sum('discount'),
+        coupon_orders=Sum('coupon_orders'),
+    )
+    if totals['orders']:
+        totals['average_order_value'] = totals['revenue'] / totals['orders']
+
+    return render(
+        request,
+        'admin/analytics/sales_dashboard.html',
+        {
+            'period': period,
+            'periods': list(PERIODS),
+            'start': start,
+            'summary': summary,
+            'totals': totals,
+            'top_products': top_products(start),
+        }
+    )
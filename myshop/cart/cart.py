@@ -6,7 +6,9 @@ Handles session-based cart storage, item calculations, and data retrieval.
 from decimal import Decimal
 from django.conf import settings
 from shop.models import Product
-from coupons.models import Coupon
+from coupons.cache import get_valid_coupon_by_id
+from shop.shipping import shipping_cost, total_weight
+from .encoding import cents_to_price, decode_cart, encode_cart, is_current, price_to_cents
 
 # ==============================================================================
 # CART CLASS
@@ -18,23 +20,27 @@ class Cart:
         Initialize the cart using the session.
         """
         self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        
-        if not cart:
-            # Save an empty cart in the session
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        payload = self.session.get(settings.CART_SESSION_ID)
+
+        # In-memory lines: product_id -> [quantity, price_cents]
+        self.cart = decode_cart(payload)
+        if payload and not is_current(payload):
+            # Transparently migrate sessions written in the legacy format.
+            self.save()
         
         # store current applied coupon
         self.coupon_id = self.session.get('coupon_id')
+
+        # Products for the current lines, fetched lazily in one query.
+        self._products = None
         
     @property
     def coupon(self):
+        """
+        The applied coupon while it is still valid, from the coupon cache.
+        """
         if self.coupon_id:
-            try:
-                return Coupon.objects.get(id=self.coupon_id)
-            except Coupon.DoesNotExist:
-                pass
+            return get_valid_coupon_by_id(self.coupon_id)
         return None
     
     def get_discount(self):
@@ -52,21 +58,18 @@ class Cart:
         return self.get_total_price_after_discount()
 
     def get_total_weight(self):
-        total_weight = 0
-        for item in self:
-            if 'product' in item:
-                total_weight += item['product'].weight * item['quantity']
-        return total_weight
+        """
+        Total weight in grams, computed from the products already fetched.
+        """
+        products = self._get_products()
+        return total_weight(
+            (products[product_id], quantity)
+            for product_id, (quantity, _) in self.cart.items()
+            if product_id in products
+        )
 
     def get_shipping_cost(self):
-        weight = self.get_total_weight()
-        if weight == 0:
-            return Decimal('0.00')
-        if weight <= 1000:
-            return Decimal('5.00')
-        if weight <= 5000:
-            return Decimal('10.00')
-        return Decimal('20.00')
+        return shipping_cost(self.get_total_weight())
 
     def get_total_price_with_shipping(self):
         return self.get_total_price_after_discount() + self.get_shipping_cost()
@@ -79,84 +82,122 @@ class Cart:
         """
         Add a product to the cart or update its quantity.
         """
-        product_id = str(product.id)
-        if product_id not in self.cart:
-            self.cart[product_id] = {
-                'quantity': 0,
-                'price': str(product.price)
-            }
+        line = self.cart.setdefault(product.id, [0, price_to_cents(product.price)])
         
         if override_quantity:
-            self.cart[product_id]['quantity'] = quantity
+            line[0] = quantity
         else:
-            self.cart[product_id]['quantity'] += quantity
+            line[0] += quantity
         self.save()
 
     def remove(self, product):
         """
         Remove a product from the cart.
         """
-        product_id = str(product.id)
-        if product_id in self.cart:
-            del self.cart[product_id]
+        if product.id in self.cart:
+            del self.cart[product.id]
             self.save()
 
     def save(self):
         """
-        Mark the session as modified to ensure it is saved.
-        """
-        self.session.modified = True
+        Write the encoded cart back to the session, marking it as modified.
+        """
+        self.session[settings.CART_SESSION_ID] = encode_cart(self.cart)
+
+    def reconcile(self):
+        """
+        Check all lines against the current product price and availability
+        in one bulk product query. Lines for deleted or unavailable products are
+        dropped and changed prices are updated in place.
+
+        Returns a report dict:
+          - removed: ids of products that no longer exist
+          - unavailable: products that are no longer available
+          - repriced: (product, old_price, new_price) tuples
+        """
+        self._products = self._fetch_products()
+        report = {'removed': [], 'unavailable': [], 'repriced': []}
+
+        for product_id, line in list(self.cart.items()):
+            product = self._products.get(product_id)
+            if product is None:
+                del self.cart[product_id]
+                report['removed'].append(product_id)
+            elif not product.available:
+                del self.cart[product_id]
+                report['unavailable'].append(product)
+            else:
+                cents = price_to_cents(product.price)
+                if cents != line[1]:
+                    report['repriced'].append(
+                        (product, cents_to_price(line[1]), product.price)
+                    )
+                    line[1] = cents
+
+        if any(report.values()):
+            self.save()
+        return report
 
     # --------------------------------------------------------------------------
     # ITERATION & CALCULATIONS
     # --------------------------------------------------------------------------
 
+    def _fetch_products(self):
+        """
+        Fetch the products (with translations) for all lines in one go.
+        """
+        products = Product.objects.filter(
+            id__in=list(self.cart)
+        ).prefetch_related('translations')
+        return {product.id: product for product in products}
+
+    def _get_products(self):
+        """
+        Return the products for the current lines, reusing the ones already
+        fetched during this request unless new lines were added since.
+        """
+        if self._products is None or not self.cart.keys() <= self._products.keys():
+            self._products = self._fetch_products()
+        return self._products
+
     def __iter__(self):
         """
         Iterate over the items in the cart and get the products from the database.
         """
-        product_ids = self.cart.keys()
-        # Fetch actual Product objects from DB
-        products = Product.objects.filter(id__in=product_ids)
-        
-        # Copy nested item dicts so runtime formatting (Decimal/product object)
-        # doesn't leak back into session JSON payload.
-        cart = {k: v.copy() for k, v in self.cart.items()}
-        existing_ids = set()
-        for product in products:
-            product_id = str(product.id)
-            cart[product_id]['product'] = product
-            existing_ids.add(product_id)
+        products = self._get_products()
 
         # Remove stale cart rows that reference deleted products.
-        stale_ids = [product_id for product_id in list(cart.keys()) if product_id not in existing_ids]
+        stale_ids = [product_id for product_id in self.cart if product_id not in products]
         if stale_ids:
             for product_id in stale_ids:
-                self.cart.pop(product_id, None)
-                cart.pop(product_id, None)
+                del self.cart[product_id]
             self.save()
-             
-        for item in cart.values():
-            if 'product' not in item:
-                continue
-            item['price'] = Decimal(item['price'])
-            item['total_price'] = item['price'] * item['quantity']
-            yield item
+
+        # Build fresh item dicts so runtime formatting (Decimal/product object)
+        # doesn't leak back into the session payload.
+        for product_id, (quantity, cents) in list(self.cart.items()):
+            price = cents_to_price(cents)
+            yield {
+                'product': products[product_id],
+                'quantity': quantity,
+                'price': price,
+                'total_price': price * quantity,
+            }
 
     def __len__(self):
         """
         Return the total total number of items in the cart.
         """
-        return sum(item['quantity'] for item in self.cart.values())
+        return sum(quantity for quantity, _ in self.cart.values())
 
     def get_total_price(self):
         """
         Calculate the total cost of all items in the cart.
         """
-        return sum(
-            Decimal(item['price']) * item['quantity'] 
-            for item in self.cart.values()
-        )
+        return cents_to_price(sum(
+            quantity * cents
+            for quantity, cents in self.cart.values()
+        ))
 
     # --------------------------------------------------------------------------
     # UTILITIES
@@ -166,5 +207,6 @@ class Cart:
         """
         Remove the cart from the session.
         """
-        del self.session[settings.CART_SESSION_ID]
-        self.save()
+        self.cart = {}
+        self.session.pop(settings.CART_SESSION_ID, None)
+        self.session.modified = True
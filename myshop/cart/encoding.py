@@ -0,0 +1,74 @@
+"""
+Compact, versioned encoding of the cart payload stored in the session.
+
+Version 1 (legacy) stored one nested dict per line keyed by the product id:
+    {'<product_id>': {'quantity': n, 'price': '<str>'}, ...}
+
+Version 2 stores parallel arrays of product ids, quantities and prices in
+cents, which keeps the session small and cheap to decode for long carts:
+    {'v': 2, 'i': [ids], 'q': [quantities], 'c': [price cents]}
+
+In memory the cart is a plain dict of ``product_id -> [quantity, cents]``.
+"""
+
+from decimal import Decimal
+
+CART_FORMAT_VERSION = 2
+
+
+def price_to_cents(price):
+    """
+    Convert a price (Decimal, str or number) into an integer amount of cents.
+    """
+    return int((Decimal(price) * 100).to_integral_value())
+
+
+def cents_to_price(cents):
+    """
+    Convert an integer amount of cents back into a two-decimal Decimal.
+    """
+    return Decimal(cents).scaleb(-2)
+
+
+def encode_cart(lines):
+    """
+    Encode in-memory cart lines into the current session payload format.
+    """
+    product_ids = list(lines)
+    return {
+        'v': CART_FORMAT_VERSION,
+        'i': product_ids,
+        'q': [lines[product_id][0] for product_id in product_ids],
+        'c': [lines[product_id][1] for product_id in product_ids],
+    }
+
+
+def decode_cart(payload):
+    """
+    Decode a session payload of any known version into in-memory cart lines.
+    Unknown or empty payloads decode to an empty cart.
+    """
+    if not payload:
+        return {}
+
+    if payload.get('v') == CART_FORMAT_VERSION:
+        return {
+            product_id: [quantity, cents]
+            for product_id, quantity, cents in zip(
+                payload['i'], payload['q'], payload['c']
+            )
+        }
+
+    # Legacy (version 1) payload: string product-id keys with nested dicts.
+    return {
+        int(product_id): [item['quantity'], price_to_cents(item['price'])]
+        for product_id, item in payload.items()
+        if isinstance(item, dict)
+    }
+
+
+def is_current(payload):
+    """
+    Return True when the payload is already stored in the current format.
+    """
+    return bool(payload) and payload.get('v') == CART_FORMAT_VERSION
@@ -0,0 +1,87 @@
+"""
+Benchmark the legacy and compact cart session encodings.
+
+Reports the serialized session size and the time needed to decode the cart
+payload (JSON decode + conversion into in-memory lines) for carts of
+different sizes.
+
+Usage:
+    python manage.py bench_cart_session
+    python manage.py bench_cart_session --lines 1 10 200 --repeat 2000
+"""
+
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.core.signing import JSONSerializer
+
+from cart.encoding import decode_cart, encode_cart, price_to_cents
+
+
+class Command(BaseCommand):
+    help = 'Compare session size and decode time of the cart payload encodings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lines',
+            type=int,
+            nargs='+',
+            default=[1, 10, 50, 100, 200],
+            help='Cart sizes (number of distinct lines) to benchmark.'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=1000,
+            help='Number of decode runs per measurement.'
+        )
+
+    def handle(self, *args, **options):
+        serializer = JSONSerializer()
+        repeat = options['repeat']
+        rng = random.Random(42)
+
+        self.stdout.write(
+            f"{'lines':>6} {'v1 bytes':>10} {'v2 bytes':>10} {'size':>7} "
+            f"{'v1 decode us':>13} {'v2 decode us':>13} {'speedup':>8}"
+        )
+        for count in options['lines']:
+            product_ids = rng.sample(range(1, 100000), count)
+            legacy = {
+                str(product_id): {
+                    'quantity': rng.randint(1, 20),
+                    'price': f'{rng.randint(100, 99999) / 100:.2f}',
+                }
+                for product_id in product_ids
+            }
+            compact = encode_cart({
+                int(product_id): [item['quantity'], price_to_cents(item['price'])]
+                for product_id, item in legacy.items()
+            })
+
+            # The cart lives inside the session dict, so measure it that way.
+            legacy_raw = serializer.dumps({'cart': legacy})
+            compact_raw = serializer.dumps({'cart': compact})
+
+            # The legacy Cart used the decoded session dict as-is, while the
+            # compact one also converts the arrays into in-memory lines.
+            legacy_time = self._decode_time(
+                lambda: serializer.loads(legacy_raw)['cart'], repeat
+            )
+            compact_time = self._decode_time(
+                lambda: decode_cart(serializer.loads(compact_raw)['cart']), repeat
+            )
+
+            self.stdout.write(
+                f'{count:>6} {len(legacy_raw):>10} {len(compact_raw):>10} '
+                f'{len(compact_raw) / len(legacy_raw):>6.0%} '
+                f'{legacy_time:>13.1f} {compact_time:>13.1f} '
+                f'{legacy_time / compact_time:>7.1f}x'
+            )
+
+    def _decode_time(self, decode, repeat):
+        """
+        Return the mean time in microseconds to decode one session payload.
+        """
+        return timeit.timeit(decode, number=repeat) / repeat * 1e6
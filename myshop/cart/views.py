@@ -13,11 +13,13 @@ from .cart import Cart
 from .forms import CartAddProductForm
 from coupons.forms import CouponApplyForm
 from shop.recommender import Recommender
+from myshop.ratelimit import rate_limit
 # ==============================================================================
 # CART MANAGEMENT VIEWS
 # ==============================================================================
 
 @require_POST
+@rate_limit('cart')
 def cart_add(request, product_id):
     """
     View to add a product to the cart or update its quantity.
@@ -38,6 +40,7 @@ def cart_add(request, product_id):
 
 
 @require_POST
+@rate_limit('cart')
 def cart_remove(request, product_id):
     """
     View to remove a specific product from the cart.
@@ -5,6 +5,10 @@ from .models import Coupon
 @admin.register(Coupon)
 
 class CouponAdmin(admin.ModelAdmin):
-    list_display =['code', 'valid_from', 'valid_to', 'discount', 'active']
+    list_display =[
+        'code', 'valid_from', 'valid_to', 'discount', 'active',
+        'times_redeemed', 'max_redemptions', 'max_redemptions_per_customer'
+    ]
     list_filter = ['code']
-    search_fields = ['code']
\ No newline at end of file
+    search_fields = ['code']
+    readonly_fields = ['times_redeemed']
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CouponsConfig(AppConfig):
     name = 'coupons'
+
+    def ready(self):
+        # Connect the cache invalidation signals
+        from . import cache  # noqa: F401
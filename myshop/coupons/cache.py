@@ -0,0 +1,117 @@
+"""
+Cached lookup of coupons.
+
+Coupons that are active and not yet expired are loaded from the database
+once into the shared cache and kept in memory by every process, indexed
+by normalised code and by id; validity windows are checked in Python, so
+applying a coupon or reading the cart's coupon never queries the database.
+
+Saving or deleting a coupon bumps a version key in the shared cache.
+Processes compare their copy with that version at most every
+COUPON_CACHE_LOCAL_SECONDS and reload on change.
+"""
+
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Coupon, normalize_code
+
+VERSION_KEY = 'coupons:version'
+
+
+class CouponSnapshot:
+    """
+    Active coupons of one cache version, indexed by code and by id.
+    """
+    def __init__(self, version, coupons):
+        self.version = version
+        self.by_code = {coupon.code_normalized: coupon for coupon in coupons}
+        self.by_id = {coupon.id: coupon for coupon in coupons}
+        self.checked = time.monotonic()
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def _load_coupons(version):
+    """
+    Active coupons of a version from the shared cache, loading them from
+    the database if this version was not cached yet.
+    """
+    key = f'coupons:active:{version}'
+    coupons = cache.get(key)
+    if coupons is None:
+        coupons = list(
+            Coupon.objects.filter(active=True, valid_to__gte=timezone.now())
+        )
+        cache.set(key, coupons, settings.COUPON_CACHE_TIMEOUT)
+    return coupons
+
+
+def get_snapshot():
+    """
+    Return the in-memory coupon snapshot, refreshing it when the shared
+    version changed.
+    """
+    global _snapshot
+    snapshot = _snapshot
+    if (
+        snapshot is not None
+        and time.monotonic() - snapshot.checked < settings.COUPON_CACHE_LOCAL_SECONDS
+    ):
+        return snapshot
+
+    with _lock:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+        if _snapshot is not None and _snapshot.version == version:
+            _snapshot.checked = time.monotonic()
+        else:
+            _snapshot = CouponSnapshot(version, _load_coupons(version))
+        return _snapshot
+
+
+def get_valid_coupon(code, now=None):
+    """
+    Return the coupon with the given code (in any case) if it can be used
+    now, else None.
+    """
+    coupon = get_snapshot().by_code.get(normalize_code(code))
+    if coupon is not None and coupon.is_valid(now or timezone.now()):
+        return coupon
+    return None
+
+
+def get_valid_coupon_by_id(coupon_id, now=None):
+    """
+    Return the coupon with the given id if it can be used now, else None.
+    """
+    coupon = get_snapshot().by_id.get(coupon_id)
+    if coupon is not None and coupon.is_valid(now or timezone.now()):
+        return coupon
+    return None
+
+
+def invalidate_coupons():
+    """
+    Make every process reload the coupons.
+    """
+    global _snapshot
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+    _snapshot = None
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def _coupon_changed(**kwargs):
+    # Reload only once the change is visible to other connections
+    transaction.on_commit(invalidate_coupons)
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='code_normalized',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=50),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:17
+
+from django.db import migrations
+
+
+def backfill_code_normalized(apps, schema_editor):
+    """
+    Store the normalised code on existing coupons.
+    """
+    Coupon = apps.get_model('coupons', 'Coupon')
+    coupons = list(Coupon.objects.only('id', 'code'))
+    for coupon in coupons:
+        coupon.code_normalized = coupon.code.strip().lower()
+    Coupon.objects.bulk_update(coupons, ['code_normalized'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0002_coupon_code_normalized'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_code_normalized, migrations.RunPython.noop),
+    ]
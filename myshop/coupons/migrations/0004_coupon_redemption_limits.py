@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0003_backfill_coupon_code_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='max_redemptions',
+            field=models.PositiveIntegerField(blank=True, help_text='Maximum number of orders using this coupon (blank for no limit)', null=True),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='max_redemptions_per_customer',
+            field=models.PositiveIntegerField(blank=True, help_text='Maximum number of orders per customer e-mail (blank for no limit)', null=True),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='times_redeemed',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:17
+
+from django.db import migrations
+from django.db.models import Count, Q
+
+
+def backfill_times_redeemed(apps, schema_editor):
+    """
+    Count the paid or reserved orders of existing coupons.
+    """
+    Coupon = apps.get_model('coupons', 'Coupon')
+    Order = apps.get_model('orders', 'Order')
+    counts = dict(
+        Order.objects.filter(coupon__isnull=False)
+        .filter(Q(paid=True) | Q(reserved_until__isnull=False))
+        .values('coupon_id').annotate(orders=Count('id'))
+        .values_list('coupon_id', 'orders').order_by()
+    )
+    coupons = list(Coupon.objects.filter(id__in=counts).only('id'))
+    for coupon in coupons:
+        coupon.times_redeemed = counts[coupon.id]
+    Coupon.objects.bulk_update(coupons, ['times_redeemed'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0004_coupon_redemption_limits'),
+        ('orders', '0013_order_stripe_session_expires_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_times_redeemed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:17
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def check_duplicate_codes(apps, schema_editor):
+    """
+    Stop before the unique constraint is added if coupons exist whose codes
+    only differ in case or spacing; which one to keep is for staff to
+    decide, so the conflicting codes are listed instead of changed.
+    """
+    Coupon = apps.get_model('coupons', 'Coupon')
+    duplicates = (
+        Coupon.objects.values('code_normalized')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .values_list('code_normalized', flat=True)
+    )
+    conflicts = [
+        sorted(Coupon.objects.filter(code_normalized=code).values_list('code', flat=True))
+        for code in duplicates
+    ]
+    if conflicts:
+        listed = '; '.join(', '.join(codes) for codes in conflicts)
+        raise RuntimeError(
+            'Coupon codes must be unique ignoring case and spacing. Rename or '
+            f'delete the duplicates before migrating: {listed}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0005_backfill_coupon_times_redeemed'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_codes, migrations.RunPython.noop),
+    ]
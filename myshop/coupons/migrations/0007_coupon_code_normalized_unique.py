@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0006_check_duplicate_coupon_codes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='coupon',
+            name='code_normalized',
+            field=models.CharField(default='', editable=False, max_length=50, unique=True),
+        ),
+    ]
@@ -1,6 +1,15 @@
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
 
+
+def normalize_code(code):
+    """
+    Form of a coupon code used for lookups: trimmed and lowercased.
+    """
+    return code.strip().lower()
+
+
 class Coupon(models.Model):
     """
     Coupon model representing a percentage discount valid for a time window.
@@ -9,8 +18,21 @@ class Coupon(models.Model):
       - valid_from / valid_to: validity period
       - discount: integer percent (0-100)
       - active: whether coupon is usable
+      - code_normalized: lowercased code used for lookups, unique so two
+        codes differing only in case or spacing cannot coexist
+      - max_redemptions: how many orders may use the coupon (blank: no limit)
+      - max_redemptions_per_customer: how many orders one e-mail address
+        may place with the coupon (blank: no limit)
+      - times_redeemed: orders holding the coupon, synced from the orders
+        by a background task (the live count is kept in Redis)
     """
     code = models.CharField(max_length=50, unique=True)
+    code_normalized = models.CharField(
+        max_length=50,
+        unique=True,
+        editable=False,
+        default=''
+    )
     valid_from = models.DateTimeField(help_text='Start datetime for coupon validity')
     valid_to = models.DateTimeField(help_text='End datetime for coupon validity')
     discount = models.IntegerField(
@@ -18,6 +40,52 @@ class Coupon(models.Model):
         help_text='Percentage value (0 to 100)'
     )
     active = models.BooleanField(default=True, help_text='Is the coupon active?')
+    max_redemptions = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text='Maximum number of orders using this coupon (blank for no limit)'
+    )
+    max_redemptions_per_customer = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text='Maximum number of orders per customer e-mail (blank for no limit)'
+    )
+    times_redeemed = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self) -> str:
-        return self.code
\ No newline at end of file
+        return self.code
+
+    def clean(self):
+        """
+        Reject a code that only differs from another coupon's code in case
+        or surrounding spaces.
+        """
+        super().clean()
+        if self.code:
+            taken = Coupon.objects.filter(
+                code_normalized=normalize_code(self.code)
+            ).exclude(pk=self.pk)
+            if taken.exists():
+                raise ValidationError({
+                    'code': 'A coupon with this code already exists (codes ignore case).'
+                })
+
+    def save(self, *args, **kwargs):
+        self.code_normalized = normalize_code(self.code)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'code' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'code_normalized'}
+        super().save(*args, **kwargs)
+
+    def is_valid(self, now):
+        """
+        Whether the coupon can be used at the given moment.
+        """
+        return self.active and self.valid_from <= now <= self.valid_to
+
+    @property
+    def has_redemption_limits(self):
+        return (
+            self.max_redemptions is not None
+            or self.max_redemptions_per_customer is not None
+        )
\ No newline at end of file
@@ -0,0 +1,276 @@
+"""
+Coupon redemption limits.
+
+A coupon may cap how many orders use it (max_redemptions) and how many
+orders one customer e-mail places with it (max_redemptions_per_customer).
+An order counts as a redemption while it is paid or still holds its stock
+reservation, unless it is cancelled; abandoned and cancelled orders give
+their redemption back. Paid orders moved to the archive tables keep
+counting.
+
+The live counts are Redis counters checked and incremented by one Lua
+script, so concurrent checkouts with the same code never wait on a row
+lock and can never overshoot the cap. Counters missing from Redis are
+seeded from the orders. When Redis is unreachable the per-coupon cap falls
+back to a conditional UPDATE of Coupon.times_redeemed.
+
+A periodic task recounts the orders of recent coupons, stores the counts
+in Coupon.times_redeemed and raises any Redis counter found below them.
+Counters are never lowered by the task, as orders being placed are
+already counted in Redis but not yet in the database.
+"""
+
+import datetime
+import logging
+from itertools import chain
+
+import redis
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from orders.models import ArchivedOrder, Order
+from shop.recommender import r
+from .models import Coupon
+
+logger = logging.getLogger(__name__)
+
+# Coupons whose validity ended longer ago than this are not reconciled
+RECONCILE_WINDOW = datetime.timedelta(days=1)
+
+# Counters are kept this long after the coupon stops being valid
+COUNTER_TTL = datetime.timedelta(days=7)
+
+# Returns -1 when the counters are not seeded, 1 or 2 when the coupon or
+# the customer limit is reached and 0 once the redemption is counted.
+_REDEEM = r.register_script("""
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+local limit = tonumber(ARGV[2])
+if limit >= 0 and tonumber(redis.call('GET', KEYS[1])) >= limit then
+    return 1
+end
+local per_customer = tonumber(ARGV[3])
+if per_customer >= 0
+    and tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or '0') >= per_customer then
+    return 2
+end
+redis.call('INCR', KEYS[1])
+redis.call('HINCRBY', KEYS[2], ARGV[1], 1)
+return 0
+""")
+
+_RELEASE = r.register_script("""
+if tonumber(redis.call('GET', KEYS[1]) or '0') > 0 then
+    redis.call('DECR', KEYS[1])
+end
+local used = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or '0')
+if used > 1 then
+    redis.call('HINCRBY', KEYS[2], ARGV[1], -1)
+elseif used == 1 then
+    redis.call('HDEL', KEYS[2], ARGV[1])
+end
+return 0
+""")
+
+# Raise the counters to at least the given counts: ARGV holds the coupon
+# count, the expiry timestamp and then customer/count pairs.
+_RAISE = r.register_script("""
+local raised = 0
+if tonumber(redis.call('GET', KEYS[1]) or '-1') < tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[1], ARGV[1])
+    raised = 1
+end
+for i = 3, #ARGV, 2 do
+    if tonumber(redis.call('HGET', KEYS[2], ARGV[i]) or '0') < tonumber(ARGV[i + 1]) then
+        redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1])
+        raised = 1
+    end
+end
+redis.call('EXPIREAT', KEYS[1], ARGV[2])
+redis.call('EXPIREAT', KEYS[2], ARGV[2])
+return raised
+""")
+
+
+class RedemptionLimitReached(Exception):
+    """
+    The coupon cannot be redeemed: its own limit or the customer's limit
+    has been reached.
+    """
+    def __init__(self, coupon, per_customer=False):
+        self.coupon = coupon
+        self.per_customer = per_customer
+        super().__init__(
+            f'Coupon {coupon.code} reached its '
+            f'{"per-customer " if per_customer else ""}redemption limit'
+        )
+
+
+def normalize_customer(email):
+    return email.strip().lower()
+
+
+def _keys(coupon_id):
+    key = f'coupons:redemptions:{coupon_id}'
+    return [key, f'{key}:customers']
+
+
+def holding_orders():
+    """
+    Orders that count as redemptions of their coupon.
+    """
+    return Order.objects.filter(
+        Q(paid=True) | Q(reserved_until__isnull=False)
+    ).exclude(status=Order.Status.CANCELLED)
+
+
+def holding_archived_orders():
+    """
+    Archived orders that count as redemptions of their coupon. Archived
+    orders never hold a reservation.
+    """
+    return ArchivedOrder.objects.filter(paid=True).exclude(status=Order.Status.CANCELLED)
+
+
+def count_redemptions(coupon_ids):
+    """
+    Redemption counts of the given coupons from the live and archived
+    orders, as {coupon_id: (count, {customer: count})}.
+    """
+    customers = {coupon_id: {} for coupon_id in coupon_ids}
+    rows = chain.from_iterable(
+        orders.filter(coupon_id__in=coupon_ids).values(
+            'coupon_id', customer=Lower('email')
+        ).annotate(orders=Count('id')).order_by()
+        for orders in [holding_orders(), holding_archived_orders()]
+    )
+    for row in rows:
+        counts = customers[row['coupon_id']]
+        customer = normalize_customer(row['customer'])
+        counts[customer] = counts.get(customer, 0) + row['orders']
+    return {
+        coupon_id: (sum(counts.values()), counts)
+        for coupon_id, counts in customers.items()
+    }
+
+
+def _raise_counters(coupon, total, customers):
+    expires = int((coupon.valid_to + COUNTER_TTL).timestamp())
+    args = [total, expires]
+    for customer, count in customers.items():
+        args += [customer, count]
+    return _RAISE(keys=_keys(coupon.id), args=args)
+
+
+def _redeem_in_db(coupon, customer):
+    """
+    Fallback used while Redis is unreachable.
+    """
+    if coupon.max_redemptions_per_customer is not None:
+        used = sum(
+            orders.filter(coupon=coupon, email__iexact=customer).count()
+            for orders in [holding_orders(), holding_archived_orders()]
+        )
+        if used >= coupon.max_redemptions_per_customer:
+            raise RedemptionLimitReached(coupon, per_customer=True)
+    counted = Coupon.objects.filter(pk=coupon.pk).filter(
+        Q(max_redemptions__isnull=True) | Q(times_redeemed__lt=F('max_redemptions'))
+    ).update(times_redeemed=F('times_redeemed') + 1)
+    if not counted:
+        raise RedemptionLimitReached(coupon)
+
+
+def redeem(coupon, email):
+    """
+    Count a redemption of `coupon` by the customer with the given e-mail.
+    Raises RedemptionLimitReached, without counting, when a limit is
+    reached. Coupons without limits are not counted here.
+    """
+    if not coupon.has_redemption_limits:
+        return
+    customer = normalize_customer(email)
+    args = [
+        customer,
+        -1 if coupon.max_redemptions is None else coupon.max_redemptions,
+        -1 if coupon.max_redemptions_per_customer is None
+        else coupon.max_redemptions_per_customer,
+    ]
+    try:
+        result = _REDEEM(keys=_keys(coupon.id), args=args)
+        if result == -1:
+            total, customers = count_redemptions([coupon.id])[coupon.id]
+            _raise_counters(coupon, total, customers)
+            result = _REDEEM(keys=_keys(coupon.id), args=args)
+    except redis.exceptions.RedisError:
+        logger.warning('Redis unavailable, counting coupon %s in the database', coupon.id)
+        _redeem_in_db(coupon, customer)
+        return
+    if result:
+        raise RedemptionLimitReached(coupon, per_customer=result == 2)
+
+
+def release(redemptions):
+    """
+    Give back the redemptions of orders that no longer count, as
+    (coupon_id, email) pairs.
+    """
+    if not redemptions:
+        return
+    try:
+        pipe = r.pipeline(transaction=False)
+        for coupon_id, email in redemptions:
+            _RELEASE(
+                keys=_keys(coupon_id),
+                args=[normalize_customer(email)],
+                client=pipe
+            )
+        pipe.execute()
+    except redis.exceptions.RedisError:
+        logger.warning('Redis unavailable, releasing coupon redemptions in the database')
+        for coupon_id, _ in redemptions:
+            Coupon.objects.filter(pk=coupon_id, times_redeemed__gt=0).update(
+                times_redeemed=F('times_redeemed') - 1
+            )
+
+
+def release_orders(order_ids):
+    """
+    Give back the coupon redemptions of the given orders once the current
+    transaction commits.
+    """
+    redemptions = list(
+        Order.objects.filter(id__in=order_ids, coupon__isnull=False)
+        .values_list('coupon_id', 'email')
+    )
+    if redemptions:
+        transaction.on_commit(lambda: release(redemptions))
+
+
+def reconcile_redemptions():
+    """
+    Store the redemption counts of recent coupons in Coupon.times_redeemed
+    and raise the Redis counters of limited coupons that fell behind.
+    Returns the number of coupons whose stored count changed.
+    """
+    coupons = list(
+        Coupon.objects.filter(valid_to__gte=timezone.now() - RECONCILE_WINDOW)
+    )
+    counts = count_redemptions([coupon.id for coupon in coupons])
+
+    changed = []
+    for coupon in coupons:
+        total, customers = counts[coupon.id]
+        if coupon.times_redeemed != total:
+            coupon.times_redeemed = total
+            changed.append(coupon)
+        if coupon.has_redemption_limits:
+            try:
+                if _raise_counters(coupon, total, customers):
+                    logger.warning('Raised the redemption counters of coupon %s', coupon.id)
+            except redis.exceptions.RedisError:
+                logger.warning('Redis unavailable, coupon counters not reconciled')
+    Coupon.objects.bulk_update(changed, ['times_redeemed'])
+    return len(changed)
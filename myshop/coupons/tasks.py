@@ -0,0 +1,20 @@
+"""
+Asynchronous tasks for the coupons application.
+Keeps the stored redemption counts in line with the orders.
+"""
+
+from celery import shared_task
+
+from .redemptions import reconcile_redemptions
+
+# ==============================================================================
+# ASYNCHRONOUS TASKS
+# ==============================================================================
+
+@shared_task
+def reconcile_coupon_redemptions():
+    """
+    Periodic task storing the redemption counts of recent coupons and
+    repairing Redis counters that fell behind the orders.
+    """
+    return reconcile_redemptions()
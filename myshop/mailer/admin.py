@@ -0,0 +1,42 @@
+"""
+Admin configuration for the mailer application.
+Queued e-mails are read-only; failed ones can be queued again.
+"""
+
+from django.contrib import admin, messages
+from django.db import transaction
+from django.utils import timezone
+
+from .dispatcher import schedule_consumer
+from .models import OutgoingEmail
+
+
+def retry_emails(modeladmin, request, queryset):
+    """
+    Admin action that queues failed e-mails again with fresh attempts.
+    """
+    retried = queryset.filter(status=OutgoingEmail.Status.FAILED).update(
+        status=OutgoingEmail.Status.QUEUED,
+        attempts=0,
+        next_attempt=timezone.now(),
+        error=''
+    )
+    transaction.on_commit(schedule_consumer)
+    modeladmin.message_user(request, f'{retried} e-mails queued again.', messages.SUCCESS)
+
+retry_emails.short_description = 'Queue failed e-mails again'
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ['id', 'to', 'subject', 'status', 'attempts', 'created', 'sent']
+    list_filter = ['status']
+    search_fields = ['to']
+    readonly_fields = [
+        'to', 'from_email', 'subject', 'body', 'attachments', 'status',
+        'attempts', 'next_attempt', 'error', 'created', 'sent'
+    ]
+    actions = [retry_emails]
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,248 @@
+"""
+Batched e-mail dispatcher.
+
+Transactional e-mails are queued as OutgoingEmail rows, one per recipient,
+with one INSERT per batch of messages. A single consumer at a time drains
+the queue: it claims due e-mails in batches, sends them over one reused
+mail connection, paced to MAILER_RATE_PER_MINUTE, and marks them sent
+with one UPDATE per batch.
+
+Attachment files are copied when an e-mail is queued, so the queue owns
+what it sends: an invoice re-rendered or removed meanwhile does not
+change or break e-mails already queued. The copies are deleted with the
+e-mails.
+
+A recipient whose e-mail fails is retried with an increasing delay, up to
+MAILER_MAX_ATTEMPTS attempts; the other recipients are not affected.
+Queueing e-mails schedules the consumer a moment later, so messages
+queued together are sent together; a periodic run picks up retries and
+anything left behind.
+"""
+
+import logging
+import secrets
+import smtplib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import storages
+from django.core.mail import get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+Status = OutgoingEmail.Status
+
+LOCK_KEY = 'mailer:consumer'
+SCHEDULED_KEY = 'mailer:scheduled'
+
+# How long a consumer may hold claimed e-mails before others take them over
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+# Where the copies of queued attachments are stored
+ATTACHMENTS_DIR = 'mail/attachments'
+
+
+def copy_attachments(email):
+    """
+    Point the attachments of an unsaved e-mail at copies owned by the queue.
+    """
+    for attachment in email.attachments:
+        with storages['private'].open(attachment['path'], 'rb') as content:
+            attachment['path'] = storages['private'].save(
+                f'{ATTACHMENTS_DIR}/{secrets.token_hex(16)}_{attachment["filename"]}',
+                content
+            )
+
+
+def queue_emails(emails):
+    """
+    Queue unsaved OutgoingEmail instances, copying their attachments, and
+    schedule the consumer once the current transaction commits.
+    """
+    now = timezone.now()
+    for email in emails:
+        copy_attachments(email)
+        email.from_email = email.from_email or settings.DEFAULT_FROM_EMAIL
+        email.next_attempt = now
+    OutgoingEmail.objects.bulk_create(emails, batch_size=settings.MAILER_BATCH_SIZE)
+    transaction.on_commit(schedule_consumer)
+    return emails
+
+
+def schedule_consumer():
+    """
+    Start the consumer after MAILER_BATCH_DELAY seconds, unless a start is
+    already scheduled.
+    """
+    # Imported here because the task module uses this one
+    from .tasks import send_queued_emails
+
+    delay = settings.MAILER_BATCH_DELAY
+    if cache.add(SCHEDULED_KEY, True, delay + 60):
+        send_queued_emails.apply_async(countdown=delay)
+
+
+class Pacer:
+    """
+    Spaces out sends to stay under a number of messages per minute.
+    """
+    def __init__(self, per_minute):
+        self.interval = 60 / per_minute if per_minute else 0
+        self.next_send = time.monotonic()
+
+    def wait(self):
+        now = time.monotonic()
+        if self.next_send > now:
+            time.sleep(self.next_send - now)
+        self.next_send = max(self.next_send, now) + self.interval
+
+
+def due_emails(now):
+    # E-mails claimed by a consumer that died are due again once their
+    # claim lapses
+    return OutgoingEmail.objects.filter(
+        status__in=[Status.QUEUED, Status.SENDING],
+        next_attempt__lte=now
+    )
+
+
+def claim_batch(size):
+    """
+    Claim the next due e-mails for this consumer.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            due_emails(now).order_by('next_attempt')
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:size]
+        )
+        OutgoingEmail.objects.filter(id__in=ids).update(
+            status=Status.SENDING,
+            attempts=F('attempts') + 1,
+            next_attempt=now + CLAIM_TIMEOUT
+        )
+    return list(OutgoingEmail.objects.filter(id__in=ids).order_by('id'))
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=settings.MAILER_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def send_batch(connection, emails, pacer):
+    """
+    Send claimed e-mails one recipient at a time over an open connection
+    and record the outcome. Returns the number of e-mails sent.
+
+    The outcome is recorded even if the connection cannot be reopened
+    after a failure; the e-mails not tried yet are handed back to the
+    queue and the error is raised.
+    """
+    sent = []
+    failed = []
+    untried = iter(emails)
+    try:
+        for email in untried:
+            pacer.wait()
+            try:
+                email.to_message(connection).send()
+            except Exception as exc:
+                logger.warning('Sending e-mail %s to %s failed: %r', email.id, email.to, exc)
+                failed.append((email, exc))
+                # Start over with a fresh connection in case this one broke
+                connection.close()
+                connection.open()
+            else:
+                sent.append(email.id)
+    finally:
+        _record_batch(sent, failed, list(untried))
+    return len(sent)
+
+
+def _record_batch(sent, failed, untried):
+    """
+    Mark sent e-mails as sent, schedule or give up failed ones and put the
+    untried ones back in the queue without counting the attempt.
+    """
+    now = timezone.now()
+    OutgoingEmail.objects.filter(id__in=sent).update(
+        status=Status.SENT,
+        sent=now,
+        error=''
+    )
+    for email, exc in failed:
+        email.error = repr(exc)
+        permanent = isinstance(exc, smtplib.SMTPRecipientsRefused)
+        if permanent or email.attempts >= settings.MAILER_MAX_ATTEMPTS:
+            email.status = Status.FAILED
+        else:
+            email.status = Status.QUEUED
+            email.next_attempt = now + retry_delay(email.attempts)
+    OutgoingEmail.objects.bulk_update(
+        [email for email, _ in failed],
+        ['status', 'next_attempt', 'error']
+    )
+    OutgoingEmail.objects.filter(id__in=[email.id for email in untried]).update(
+        status=Status.QUEUED,
+        attempts=F('attempts') - 1,
+        next_attempt=now
+    )
+
+
+def dispatch(max_seconds=None):
+    """
+    Send due e-mails until the queue is drained or `max_seconds` (default
+    MAILER_MAX_SECONDS) have passed. Only one consumer runs at a time;
+    returns the number of e-mails sent, or None if another consumer is
+    running.
+    """
+    if not cache.add(LOCK_KEY, True, CLAIM_TIMEOUT.total_seconds()):
+        return None
+    # E-mails queued from now on schedule another run
+    cache.delete(SCHEDULED_KEY)
+    deadline = time.monotonic() + (max_seconds or settings.MAILER_MAX_SECONDS)
+    pacer = Pacer(settings.MAILER_RATE_PER_MINUTE)
+    sent = 0
+    try:
+        connection = get_connection()
+        connection.open()
+        try:
+            while time.monotonic() < deadline:
+                emails = claim_batch(settings.MAILER_BATCH_SIZE)
+                if not emails:
+                    break
+                sent += send_batch(connection, emails, pacer)
+        finally:
+            connection.close()
+    finally:
+        cache.delete(LOCK_KEY)
+
+    # Continue with what was queued meanwhile or left when time ran out
+    if due_emails(timezone.now()).exists():
+        schedule_consumer()
+    return sent
+
+
+def purge_sent_emails():
+    """
+    Delete e-mails sent more than MAILER_KEEP_DAYS days ago, with their
+    attachment copies.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.MAILER_KEEP_DAYS)
+    emails = OutgoingEmail.objects.filter(status=Status.SENT, sent__lt=cutoff)
+    paths = [
+        attachment['path']
+        for attachments in emails.exclude(attachments=[]).values_list('attachments', flat=True)
+        for attachment in attachments
+    ]
+    deleted, _ = emails.delete()
+    for path in paths:
+        storages['private'].delete(path)
+    return deleted
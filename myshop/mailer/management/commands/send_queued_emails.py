@@ -0,0 +1,30 @@
+"""
+Send the queued e-mails that are due in this process.
+
+Usage:
+    python manage.py send_queued_emails
+    python manage.py send_queued_emails --seconds 300
+"""
+
+from django.core.management.base import BaseCommand
+
+from mailer.dispatcher import dispatch
+
+
+class Command(BaseCommand):
+    help = 'Drain the outgoing e-mail queue over one mail connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seconds',
+            type=int,
+            default=None,
+            help='Stop after this many seconds (defaults to MAILER_MAX_SECONDS).'
+        )
+
+    def handle(self, *args, **options):
+        sent = dispatch(options['seconds'])
+        if sent is None:
+            self.stdout.write(self.style.WARNING('Another consumer is sending the queue.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Sent {sent} e-mails.'))
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:17
+
+from django.core.files.storage import default_storage, storages
+from django.db import migrations
+
+
+def move_attachments(apps, schema_editor):
+    """
+    Move the attachment copies of queued e-mails out of media storage into
+    private storage, under the same paths.
+    """
+    OutgoingEmail = apps.get_model('mailer', 'OutgoingEmail')
+    private = storages['private']
+    emails = OutgoingEmail.objects.exclude(attachments=[]).values_list('attachments', flat=True)
+    for attachments in emails:
+        for attachment in attachments:
+            path = attachment['path']
+            if not default_storage.exists(path) or private.exists(path):
+                continue
+            with default_storage.open(path, 'rb') as content:
+                private.save(path, content)
+            default_storage.delete(path)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_attachments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+"""
+Models for the mailer application.
+Queue of outgoing transactional e-mails, one row per recipient.
+"""
+from django.core.files.storage import storages
+from django.core.mail import EmailMessage
+from django.db import models
+
+# ==============================================================================
+# OUTGOING E-MAIL QUEUE
+# ==============================================================================
+
+class OutgoingEmail(models.Model):
+    """
+    An e-mail to one recipient, queued by mailer.dispatcher.queue_emails
+    and sent by the dispatcher.
+    Attachments are files in private storage, read when the e-mail is sent:
+    a list of {'filename', 'path', 'mimetype'} dicts. The paths point to
+    copies made by queue_emails, which live as long as the e-mail.
+    """
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        SENDING = 'sending', 'Sending'
+        SENT = 'sent', 'Sent'
+        FAILED = 'failed', 'Failed'
+
+    to = models.EmailField()
+    from_email = models.CharField(max_length=254, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    attachments = models.JSONField(default=list, blank=True)
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    # When the e-mail is due; while sending, when its claim lapses
+    next_attempt = models.DateTimeField()
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    sent = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt']),
+            models.Index(fields=['status', 'sent']),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} to {self.to}'
+
+    def to_message(self, connection=None):
+        """
+        Build the Django e-mail message, reading the attachments from
+        storage.
+        """
+        message = EmailMessage(
+            self.subject,
+            self.body,
+            self.from_email or None,
+            [self.to],
+            connection=connection
+        )
+        for attachment in self.attachments:
+            with storages['private'].open(attachment['path'], 'rb') as content:
+                message.attach(
+                    attachment['filename'],
+                    content.read(),
+                    attachment.get('mimetype')
+                )
+        return message
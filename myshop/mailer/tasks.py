@@ -0,0 +1,28 @@
+"""
+Asynchronous tasks for the mailer application.
+Runs the e-mail queue consumer.
+"""
+
+from celery import shared_task
+
+from .dispatcher import dispatch, purge_sent_emails
+
+# ==============================================================================
+# ASYNCHRONOUS TASKS
+# ==============================================================================
+
+@shared_task(ignore_result=True)
+def send_queued_emails():
+    """
+    Send the queued e-mails that are due. Scheduled when e-mails are
+    queued and periodically for retries.
+    """
+    return dispatch()
+
+
+@shared_task
+def purge_emails():
+    """
+    Periodic task deleting old sent e-mails from the queue table.
+    """
+    return purge_sent_emails()
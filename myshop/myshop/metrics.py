@@ -0,0 +1,16 @@
+"""
+Prometheus metrics endpoint.
+
+Exposes the metrics collected in this process (e.g. Stripe API latency)
+to scrapers whose address is listed in settings.METRICS_ALLOWED_IPS.
+"""
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+
+def metrics(request):
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(), content_type=CONTENT_TYPE_LATEST)
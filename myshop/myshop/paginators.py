@@ -0,0 +1,50 @@
+"""
+Paginators for admin changelists over very large tables.
+"""
+
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the query planner's row estimate instead of an
+    exact COUNT(*) when the result set is large.
+
+    The estimate comes from EXPLAIN and requires PostgreSQL. Below
+    `threshold` rows, and always on other databases, the exact count is
+    used: on SQLite, the development database of this project, this
+    paginator behaves exactly like the plain Paginator and gives no
+    speedup.
+    """
+    threshold = 10000
+
+    @cached_property
+    def count(self):
+        estimate = self.estimate_count()
+        if estimate is not None and estimate >= self.threshold:
+            return estimate
+        return super().count
+
+    def estimate_count(self):
+        """
+        Planner estimate of the number of rows, or None if unavailable.
+        """
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+
+        sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
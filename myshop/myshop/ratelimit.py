@@ -0,0 +1,148 @@
+"""
+Sliding-window rate limiting for views.
+
+Counts are kept per client IP and per session in fixed windows; the
+previous window is weighted by how much of it still overlaps the sliding
+window, which gives a close approximation of a true sliding log at the
+cost of one Redis round trip per request.
+
+Counters live in the shared Redis instance. When Redis is unreachable an
+in-process fallback is used so the limits keep working on each worker.
+"""
+
+import threading
+import time
+from functools import wraps
+
+import redis
+from django.conf import settings
+from django.http import HttpResponse
+
+from shop.recommender import r
+
+# Seconds to stay on the in-memory fallback after a Redis failure.
+REDIS_RETRY_AFTER = 30
+
+
+class MemoryCounter:
+    """
+    Thread-safe in-process window counters used when Redis is unavailable.
+    """
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key, window_index, ttl):
+        with self._lock:
+            now = time.monotonic()
+            if len(self._counts) > 10000:
+                self._counts = {
+                    k: v for k, v in self._counts.items() if v[1] > now
+                }
+            count, expires = self._counts.get((key, window_index), (0, 0))
+            if expires <= now:
+                count = 0
+            self._counts[(key, window_index)] = (count + 1, now + ttl)
+            previous, previous_expires = self._counts.get(
+                (key, window_index - 1), (0, 0)
+            )
+            if previous_expires <= now:
+                previous = 0
+            return count + 1, previous
+
+
+class RedisCounter:
+    """
+    Window counters stored in Redis, updated with one pipelined round trip.
+    """
+    def hit(self, key, window_index, ttl):
+        current_key = f'ratelimit:{key}:{window_index}'
+        previous_key = f'ratelimit:{key}:{window_index - 1}'
+        pipe = r.pipeline(transaction=False)
+        pipe.incr(current_key)
+        pipe.expire(current_key, ttl)
+        pipe.get(previous_key)
+        current, _, previous = pipe.execute()
+        return current, int(previous or 0)
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding-window counter limiter with a Redis backend and an in-memory
+    fallback.
+    """
+    def __init__(self):
+        self.redis_counter = RedisCounter()
+        self.memory_counter = MemoryCounter()
+        self._redis_down_until = 0
+
+    def _hit(self, key, window_index, ttl):
+        if time.monotonic() >= self._redis_down_until:
+            try:
+                return self.redis_counter.hit(key, window_index, ttl)
+            except redis.exceptions.RedisError:
+                self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+        return self.memory_counter.hit(key, window_index, ttl)
+
+    def is_allowed(self, key, limit, window):
+        """
+        Record a hit for `key` and return True while it stays within `limit`
+        requests per `window` seconds.
+        """
+        now = time.time()
+        window_index = int(now // window)
+        elapsed = (now % window) / window
+        current, previous = self._hit(key, window_index, window * 2)
+        return previous * (1 - elapsed) + current <= limit
+
+
+limiter = SlidingWindowLimiter()
+
+
+def get_client_ip(request):
+    """
+    Return the client address used for per-IP limits.
+    """
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def too_many_requests(window):
+    """
+    Cheap rejection response that does not touch the session or database.
+    """
+    response = HttpResponse('Too many requests.', status=429, content_type='text/plain')
+    response['Retry-After'] = str(window)
+    return response
+
+
+def rate_limit(scope):
+    """
+    View decorator applying the per-IP and per-session limits configured
+    for `scope` in settings.RATE_LIMITS, e.g.:
+
+        RATE_LIMITS = {
+            'coupon': {'ip': (30, 60), 'session': (10, 60)},
+        }
+
+    Each entry is (max requests, window in seconds).
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if settings.RATE_LIMIT_ENABLED:
+                limits = settings.RATE_LIMITS.get(scope, {})
+                checks = []
+                if 'ip' in limits:
+                    checks.append((f'{scope}:ip:{get_client_ip(request)}', limits['ip']))
+                # The session key comes from the cookie; reading it does not
+                # load the session data.
+                session_key = request.session.session_key
+                if 'session' in limits and session_key:
+                    checks.append((f'{scope}:session:{session_key}', limits['session']))
+
+                for key, (limit, window) in checks:
+                    if not limiter.is_allowed(key, limit, window):
+                        return too_many_requests(window)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -21,6 +21,9 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+# Absolute base URL used in links sent by e-mail
+SITE_URL = config('SITE_URL', default='http://127.0.0.1:8000')
+
 ROOT_URLCONF = 'myshop.urls'
 WSGI_APPLICATION = 'myshop.wsgi.application'
 
@@ -44,6 +47,8 @@ INSTALLED_APPS = [
     'orders.apps.OrdersConfig',
     'payment.apps.PaymentConfig',
     'coupons.apps.CouponsConfig',
+    'analytics.apps.AnalyticsConfig',
+    'mailer.apps.MailerConfig',
     'rosetta',
     'parler',
     'localflavor',
@@ -160,6 +165,23 @@ STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Files served only through views that check permissions, such as order
+# exports. Kept outside MEDIA_ROOT so no media URL ever reaches them.
+PRIVATE_MEDIA_ROOT = BASE_DIR / 'private'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    'private': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': PRIVATE_MEDIA_ROOT},
+    },
+}
+
 
 # ==============================================================================
 # THIRD-PARTY APIS & INTEGRATIONS
@@ -170,9 +192,39 @@ STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY')
 STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET')
 # STRIPE_API_VERSION= '2026-01-28'
+# Point at http://127.0.0.1:12111 to use the local stand-in (manage.py stripe_stub)
+STRIPE_API_BASE = config('STRIPE_API_BASE', default='https://api.stripe.com')
+# (connect, read) timeouts in seconds
+STRIPE_TIMEOUT = (3.05, 20)
+STRIPE_MAX_NETWORK_RETRIES = 2
+# Keep-alive connections kept open to the Stripe API per process
+STRIPE_POOL_SIZE = 10
+
+# Stored webhook events: seconds after which an event still marked as
+# processing is taken over (its worker died), and how often failed events
+# are requeued, first retry delay in seconds (doubled on each further
+# attempt)
+STRIPE_EVENT_CLAIM_TIMEOUT = 600
+STRIPE_EVENT_MAX_ATTEMPTS = 10
+STRIPE_EVENT_RETRY_DELAY = 60
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'admin@myshop.com'
+
+# Queued e-mail dispatcher (mailer app): e-mails claimed per batch, seconds
+# to gather queued e-mails before sending, sending rate over the one
+# connection and longest run of the consumer task
+MAILER_BATCH_SIZE = 100
+MAILER_BATCH_DELAY = 2
+MAILER_RATE_PER_MINUTE = 6000
+MAILER_MAX_SECONDS = 50
+
+# Attempts per recipient, first retry delay in seconds (doubled on each
+# attempt) and days sent e-mails are kept
+MAILER_MAX_ATTEMPTS = 5
+MAILER_RETRY_DELAY = 60
+MAILER_KEEP_DAYS = 30
 
 
 # ==============================================================================
@@ -181,10 +233,96 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 CART_SESSION_ID = 'cart'
 
+# Shipping tiers: (max total weight in grams, cost); None means no upper limit
+SHIPPING_RATES = [
+    (0, '0.00'),
+    (1000, '5.00'),
+    (5000, '10.00'),
+    (None, '20.00'),
+]
+
+# Minutes an unpaid order keeps its stock reserved
+ORDER_RESERVATION_MINUTES = 60
+
+# Orders older than this many days are moved to the archive tables, in
+# batches of this many orders per transaction
+ORDER_ARCHIVE_DAYS = 730
+ORDER_ARCHIVE_BATCH_SIZE = 1000
+
+# Hours of paid Checkout sessions checked by the payment reconciliation
+PAYMENT_RECONCILIATION_HOURS = 3
+
+# Addresses allowed to scrape /metrics/
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+
+
+# ========================================
+# Celery beat schedule
+# =======================================
+CELERY_BEAT_SCHEDULE = {
+    'expire-order-reservations': {
+        'task': 'orders.tasks.expire_reservations',
+        'schedule': 300.0,
+    },
+    'requeue-stripe-events': {
+        'task': 'payment.tasks.requeue_stripe_events',
+        'schedule': 300.0,
+    },
+    'reconcile-payments': {
+        'task': 'payment.tasks.reconcile_payments',
+        'schedule': 3600.0,
+    },
+    'rollup-recent-sales': {
+        'task': 'analytics.tasks.rollup_recent_sales',
+        'schedule': 3600.0,
+    },
+    'reconcile-coupon-redemptions': {
+        'task': 'coupons.tasks.reconcile_coupon_redemptions',
+        'schedule': 300.0,
+    },
+    'send-queued-emails': {
+        'task': 'mailer.tasks.send_queued_emails',
+        'schedule': 60.0,
+    },
+    'purge-emails': {
+        'task': 'mailer.tasks.purge_emails',
+        'schedule': 86400.0,
+    },
+    'archive-old-orders': {
+        'task': 'orders.tasks.archive_old_orders',
+        'schedule': 86400.0,
+    },
+}
+
 
 # ========================================
 # Redis settings
 # =======================================
 REDIS_HOST = 'localhost'
 REDIS_PORT = '6379'
-REDIS_DB = 1
\ No newline at end of file
+REDIS_DB = 1
+
+# Shared cache (coupon lookups)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}',
+        'KEY_PREFIX': 'myshop',
+    }
+}
+
+# Seconds the active coupons stay in the shared cache, and how often each
+# process checks whether its in-memory copy is still current
+COUPON_CACHE_TIMEOUT = 3600
+COUPON_CACHE_LOCAL_SECONDS = 5
+
+
+# ========================================
+# Rate limiting
+# =======================================
+# Per scope: (max requests, window in seconds) per client IP and per session
+RATE_LIMIT_ENABLED = True
+RATE_LIMITS = {
+    'cart': {'ip': (120, 60), 'session': (60, 60)},
+    'coupon': {'ip': (30, 60), 'session': (10, 60)},
+}
\ No newline at end of file
@@ -10,6 +10,7 @@ from django.conf import settings
 from django.conf.urls.i18n import i18n_patterns
 from django.utils.translation import gettext_lazy as _
 from payment import webhooks
+from . import metrics
 
 # ==============================================================================
 # URL ROUTING
@@ -30,6 +31,9 @@ urlpatterns = i18n_patterns(
     
     # coupon for discount
     path(_('coupons/'), include('coupons.urls', namespace='coupons')),
+
+    # Sales analytics
+    path(_('analytics/'), include('analytics.urls', namespace='analytics')),
     
     path('rosetta/', include('rosetta.urls')),
     # Product Catalog (Root)
@@ -38,6 +42,7 @@ urlpatterns = i18n_patterns(
 
 urlpatterns +=[
     path('payment/webhook/', webhooks.stripe_webhook, name='stripe_webhook'),
+    path('metrics/', metrics.metrics, name='metrics'),
 ]
 
 # ==============================================================================
@@ -1,56 +1,127 @@
 """
 Admin configuration for the orders application.
-Includes custom actions for CSV export and custom columns for 
+Includes streaming CSV/JSONL export actions and custom columns for 
 Stripe payments, PDF invoices, and detailed views.
 """
 
-import csv
-import datetime
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.safestring import mark_safe
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.urls import reverse
 
-from .models import Order, OrderItem
+from myshop.paginators import EstimatedCountPaginator
+from .exports import stream_csv, stream_jsonl
+from .fulfillment import transition_orders
+from .models import (
+    ArchivedOrder,
+    ArchivedOrderItem,
+    Order,
+    OrderExport,
+    OrderItem,
+    OrderStatusChange,
+)
+from .search import search_orders
+from .tasks import export_orders
 
 # ==============================================================================
 # ACTIONS
 # ==============================================================================
 
-def export_to_csv(modeladmin, request, queryset):
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv'),
+    'jsonl': (stream_jsonl, 'application/x-ndjson'),
+}
+
+
+def make_export_action(export_format, include_items=False):
     """
-    Generic admin action to export selected models to a CSV file.
-    Excludes Many-to-Many and One-to-Many fields to keep it flat.
+    Build an admin action that streams the selected orders as CSV or JSONL,
+    optionally including their line items.
     """
-    opts = modeladmin.model._meta
-    content_disposition = f'attachment; filename={opts.verbose_name}.csv'
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = content_disposition
-    writer = csv.writer(response)
-    
-    # Get physical fields of the model
-    fields = [
-        field for field in opts.get_fields() 
-        if not field.many_to_many and not field.one_to_many
-    ]
-    
-    # Write header row
-    writer.writerow([field.verbose_name for field in fields])
-    
-    # Write data rows
-    for obj in queryset:
-        data_row = []
-        for field in fields:
-            value = getattr(obj, field.name)
-            if isinstance(value, datetime.datetime):
-                value = value.strftime('%d/%m/%Y')
-            data_row.append(value)
-        writer.writerow(data_row)
-    
-    return response
-
-export_to_csv.short_description = 'Export to CSV'
+    stream, content_type = EXPORT_FORMATS[export_format]
+
+    def export(modeladmin, request, queryset):
+        opts = modeladmin.model._meta
+        response = StreamingHttpResponse(
+            stream(queryset, include_items=include_items),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename={opts.verbose_name}.{export_format}'
+        )
+        return response
+
+    suffix = ' with items' if include_items else ''
+    export.__name__ = f'export_to_{export_format}' + ('_with_items' if include_items else '')
+    export.short_description = f'Export to {export_format.upper()}{suffix}'
+    return export
+
+
+export_to_csv = make_export_action('csv')
+export_to_csv_with_items = make_export_action('csv', include_items=True)
+export_to_jsonl = make_export_action('jsonl')
+export_to_jsonl_with_items = make_export_action('jsonl', include_items=True)
+
+
+def make_background_export_action(export_format):
+    """
+    Build an admin action that queues a background export of the selected
+    orders (with line items) and e-mails the requester when it is ready.
+    """
+    def queue_export(modeladmin, request, queryset):
+        export = OrderExport.objects.create(
+            requested_by=request.user,
+            email=request.user.email,
+            export_format=export_format,
+            include_items=True,
+            order_ids=list(queryset.values_list('id', flat=True))
+        )
+        export_orders.delay(export.id)
+        url = reverse('admin:orders_orderexport_change', args=[export.id])
+        modeladmin.message_user(
+            request,
+            mark_safe(f'Export queued. Follow its progress <a href="{url}">here</a>.'),
+            messages.SUCCESS
+        )
+
+    queue_export.__name__ = f'queue_{export_format}_export'
+    queue_export.short_description = f'Export to {export_format.upper()} in background'
+    return queue_export
+
+
+queue_csv_export = make_background_export_action('csv')
+queue_jsonl_export = make_background_export_action('jsonl')
+
+
+# Invoices are rendered in a process pool by the export task, never in
+# the admin request
+download_invoices = make_background_export_action(OrderExport.Format.INVOICES.value)
+download_invoices.short_description = 'Render invoices (ZIP) in background'
+
+
+def make_transition_action(status, label):
+    """
+    Build an admin action that moves the selected orders to a fulfillment
+    status in batched UPDATEs; orders that cannot move there are skipped.
+    """
+    def transition(modeladmin, request, queryset):
+        moved = transition_orders(queryset, status, user=request.user, note='Admin action')
+        modeladmin.message_user(
+            request,
+            f'{len(moved)} orders marked as {status.label.lower()}.',
+            messages.SUCCESS if moved else messages.WARNING
+        )
+
+    transition.__name__ = f'mark_{status.value}'
+    transition.short_description = label
+    transition.allowed_permissions = ('change',)
+    return transition
+
+
+mark_packed = make_transition_action(Order.Status.PACKED, 'Mark as packed')
+mark_shipped = make_transition_action(Order.Status.SHIPPED, 'Mark as shipped')
+mark_delivered = make_transition_action(Order.Status.DELIVERED, 'Mark as delivered')
+mark_cancelled = make_transition_action(Order.Status.CANCELLED, 'Cancel orders')
 
 
 # ==============================================================================
@@ -82,6 +153,57 @@ def order_pdf(obj):
 order_pdf.short_description = 'Invoice'
 
 
+def export_progress(obj):
+    """Displays the progress of a background export."""
+    return f'{obj.get_progress()}% ({obj.processed}/{obj.total})'
+
+export_progress.short_description = 'Progress'
+
+
+def export_download(obj):
+    """Displays a download link once the export is ready."""
+    if obj.status != OrderExport.Status.DONE:
+        return ''
+    url = reverse('orders:admin_order_export_download', args=[obj.id])
+    return mark_safe(f'<a href="{url}">Download</a>')
+
+export_download.short_description = 'File'
+
+
+# ==============================================================================
+# FILTERS
+# ==============================================================================
+
+class TotalCostFilter(admin.SimpleListFilter):
+    """Filters orders by stored grand total ranges."""
+    title = 'total'
+    parameter_name = 'total'
+    ranges = {
+        'lt50': (None, 50),
+        '50-200': (50, 200),
+        '200-1000': (200, 1000),
+        'gte1000': (1000, None),
+    }
+
+    def lookups(self, request, model_admin):
+        return [
+            ('lt50', 'Under $50'),
+            ('50-200', '$50 to $200'),
+            ('200-1000', '$200 to $1000'),
+            ('gte1000', '$1000 and over'),
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value() not in self.ranges:
+            return queryset
+        low, high = self.ranges[self.value()]
+        if low is not None:
+            queryset = queryset.filter(total_cost__gte=low)
+        if high is not None:
+            queryset = queryset.filter(total_cost__lt=high)
+        return queryset
+
+
 # ==============================================================================
 # INLINES
 # ==============================================================================
@@ -90,6 +212,34 @@ class OrderItemInline(admin.TabularInline):
     """Allows managing Order Items directly within the Order admin page."""
     model = OrderItem
     raw_id_fields = ['product']
+    readonly_fields = ['product_name', 'language_code', 'weight']
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    """Read-only line items of an archived order."""
+    model = ArchivedOrderItem
+    fields = ['product', 'product_name', 'price', 'quantity', 'weight']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class OrderStatusChangeInline(admin.TabularInline):
+    """Read-only fulfillment history of an order."""
+    model = OrderStatusChange
+    fields = ['changed', 'from_status', 'to_status', 'changed_by', 'note']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 # ==============================================================================
@@ -101,14 +251,94 @@ class OrderAdmin(admin.ModelAdmin):
     """
     Admin interface configuration for the Order model.
     Includes custom filters, search, inlines, and CSV export action.
+    Search and filters run on indexed columns and the changelist uses an
+    estimated row count, so it stays fast on very large order tables.
     """
     list_display = [
         'id', 'first_name', 'last_name', 'email', 
-        'address', 'postal_code', 'city', 'paid',
+        'address', 'postal_code', 'city', 'total_cost', 'paid', 'status',
         order_payment, 'created', 'updated', 
         order_detail, order_pdf
     ]
-    list_filter = ['paid', 'created', 'updated']
-    search_fields = ['first_name', 'last_name', 'email']
-    inlines = [OrderItemInline]
-    actions = [export_to_csv]
\ No newline at end of file
+    list_filter = ['status', 'paid', TotalCostFilter, 'created', 'updated']
+    search_fields = ['search_first_name', 'search_last_name', 'search_email']
+    search_help_text = 'Order id, or the start of the first name, last name or e-mail.'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    inlines = [OrderItemInline, OrderStatusChangeInline]
+    readonly_fields = [
+        'status', 'status_changed', 'stripe_refund_id',
+        'subtotal', 'discount_amount', 'total_cost',
+        'stripe_session_id', 'stripe_session_url', 'stripe_session_expires',
+        'stripe_session_fingerprint'
+    ]
+    actions = [
+        export_to_csv,
+        export_to_csv_with_items,
+        export_to_jsonl,
+        export_to_jsonl_with_items,
+        queue_csv_export,
+        queue_jsonl_export,
+        download_invoices,
+        mark_packed,
+        mark_shipped,
+        mark_delivered,
+        mark_cancelled,
+    ]
+
+    def get_search_results(self, request, queryset, search_term):
+        return search_orders(queryset, search_term), False
+
+
+@admin.register(OrderExport)
+class OrderExportAdmin(admin.ModelAdmin):
+    """
+    Admin interface for background order exports.
+    Exports are created from the order list actions or the export_orders
+    management command and are read-only here.
+    """
+    list_display = [
+        'id', 'export_format', 'include_items', 'status',
+        export_progress, 'requested_by', 'created', 'finished',
+        export_download
+    ]
+    list_filter = ['status', 'export_format']
+    readonly_fields = [
+        'requested_by', 'email', 'export_format', 'include_items',
+        'created_from', 'created_to', 'status', 'total', 'processed',
+        export_download, 'error', 'created', 'finished'
+    ]
+    # The file lives in private storage and is only linked through the
+    # staff download view
+    exclude = ['order_ids', 'file']
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    """
+    Read-only admin for orders moved to the archive tables by
+    orders.archive. Detail and invoice links work as for live orders.
+    """
+    list_display = [
+        'id', 'first_name', 'last_name', 'email', 'total_cost', 'paid',
+        'status', order_payment, 'created', 'archived',
+        order_detail, order_pdf
+    ]
+    list_filter = ['status', 'paid']
+    search_fields = ['=id', '=email']
+    search_help_text = 'Exact order id or e-mail.'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    inlines = [ArchivedOrderItemInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,118 @@
+"""
+Archiving of old orders.
+
+Orders older than ORDER_ARCHIVE_DAYS are moved, with their items and
+status log, from the Order and OrderItem tables into ArchivedOrder and
+ArchivedOrderItem, keeping their ids. Each batch is copied with two bulk
+INSERTs and removed with a few DELETEs in one transaction, so the live
+tables only hold recent orders while years of history stay available
+read-only in the admin and invoice views.
+
+Orders still holding stock or being fulfilled are left in place.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem, OrderStatusChange
+
+# Columns copied from the live tables
+ORDER_FIELDS = [
+    field.attname for field in ArchivedOrder._meta.concrete_fields
+    if field.name not in ('status_history', 'archived')
+]
+ITEM_FIELDS = [
+    field.attname for field in ArchivedOrderItem._meta.concrete_fields
+    if field.name != 'id'
+]
+
+
+def archive_cutoff(days=None):
+    """
+    Orders created before this moment are archived.
+    """
+    days = settings.ORDER_ARCHIVE_DAYS if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_orders(cutoff):
+    return Order.objects.filter(
+        created__lt=cutoff,
+        reserved_until__isnull=True
+    ).exclude(status__in=[Order.Status.PACKED, Order.Status.SHIPPED])
+
+
+def _status_history(order_ids):
+    history = {}
+    changes = OrderStatusChange.objects.filter(order_id__in=order_ids).order_by('changed')
+    for change in changes:
+        history.setdefault(change.order_id, []).append({
+            'changed': change.changed.isoformat(),
+            'from_status': change.from_status,
+            'to_status': change.to_status,
+            'changed_by': change.changed_by_id,
+            'note': change.note,
+        })
+    return history
+
+
+def archive_batch(order_ids):
+    """
+    Move the given orders into the archive tables. The orders must be
+    locked by the caller.
+    """
+    history = _status_history(order_ids)
+    ArchivedOrder.objects.bulk_create([
+        ArchivedOrder(
+            status_history=history.get(order.id, []),
+            **{name: getattr(order, name) for name in ORDER_FIELDS}
+        )
+        for order in Order.objects.filter(id__in=order_ids).only(*ORDER_FIELDS)
+    ])
+    ArchivedOrderItem.objects.bulk_create([
+        ArchivedOrderItem(**item)
+        for item in OrderItem.objects.filter(order_id__in=order_ids).values(*ITEM_FIELDS)
+    ])
+    # Items and status log are removed with the orders
+    Order.objects.filter(id__in=order_ids).delete()
+
+
+def archive_orders(days=None, batch_size=None):
+    """
+    Archive the orders older than `days` (default ORDER_ARCHIVE_DAYS) in
+    batches of `batch_size` (default ORDER_ARCHIVE_BATCH_SIZE), one
+    transaction per batch. Returns the number of archived orders.
+    """
+    cutoff = archive_cutoff(days)
+    batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+    archived = 0
+    while True:
+        with transaction.atomic():
+            order_ids = list(
+                archivable_orders(cutoff).order_by('id')
+                .select_for_update(skip_locked=True)
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if order_ids:
+                archive_batch(order_ids)
+        archived += len(order_ids)
+        if len(order_ids) < batch_size:
+            return archived
+
+
+def get_order_or_archived(order_id):
+    """
+    Return the live order with the given id, or its archived copy.
+    Raises Http404 if neither exists.
+    """
+    order = (
+        Order.objects.filter(id=order_id).first()
+        or ArchivedOrder.objects.filter(id=order_id).first()
+    )
+    if order is None:
+        raise Http404('No order matches the given query.')
+    return order
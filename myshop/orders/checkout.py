@@ -0,0 +1,64 @@
+"""
+Checkout service.
+Turns a reconciled cart into a persisted order with a constant number of
+database round trips, whatever the number of cart lines.
+"""
+
+from django.db import transaction
+
+from coupons import redemptions
+from shop.shipping import shipping_cost, total_weight
+from .models import OrderItem
+from .reservations import reserve_order
+
+
+def place_order(form, cart, cart_items):
+    """
+    Create the order for the validated checkout form and the cart items.
+
+    Prices, weight and shipping are computed once from the cart in memory;
+    stock is reserved, the order is inserted with one save and its items
+    (with product snapshots) with one bulk_create, all inside a single
+    transaction.
+    The coupon redemption is counted first and given back if the order
+    cannot be placed.
+    Raises shop.inventory.OutOfStock when stock cannot be reserved and
+    coupons.redemptions.RedemptionLimitReached when the coupon is used up.
+    """
+    order = form.save(commit=False)
+    lines = [(item['product'], item['quantity']) for item in cart_items]
+
+    coupon = cart.coupon
+    if coupon:
+        order.coupon = coupon
+        order.discount = coupon.discount
+
+    # Freeze weight, shipping and totals from the cart already in memory;
+    # discount amount and total are derived when the order is saved.
+    order.total_weight = total_weight(lines)
+    order.shipping_cost = shipping_cost(order.total_weight)
+    order.subtotal = sum(item['total_price'] for item in cart_items)
+
+    if coupon:
+        redemptions.redeem(coupon, order.email)
+    try:
+        with transaction.atomic():
+            reserve_order(order, lines)
+            order.save()
+            items = []
+            for item in cart_items:
+                order_item = OrderItem(
+                    order=order,
+                    product=item['product'],
+                    price=item['price'],
+                    quantity=item['quantity']
+                )
+                # Product translations were prefetched with the cart.
+                order_item.take_snapshot(item['product'])
+                items.append(order_item)
+            OrderItem.objects.bulk_create(items)
+    except Exception:
+        if coupon:
+            redemptions.release([(coupon.id, order.email)])
+        raise
+    return order
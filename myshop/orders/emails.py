@@ -0,0 +1,46 @@
+"""
+Customer e-mails about orders, queued through the mailer dispatcher.
+"""
+
+from mailer.models import OutgoingEmail
+from .models import Order
+
+STATUS_EMAILS = {
+    Order.Status.SHIPPED: 'Your order {id} has been shipped and is on its way.',
+    Order.Status.DELIVERED: 'Your order {id} has been delivered. Enjoy!',
+    Order.Status.CANCELLED: 'Your order {id} has been cancelled.',
+}
+
+
+def order_created_email(order):
+    """
+    Confirmation e-mail for a newly placed order.
+    """
+    return OutgoingEmail(
+        to=order.email,
+        subject=f'Order nr. {order.id}',
+        body=(
+            f'Dear {order.first_name},\n\n'
+            f'You have successfully placed an order. '
+            f'Your order ID is {order.id}.'
+        )
+    )
+
+
+def status_emails(order_ids, status):
+    """
+    E-mails telling the customers of the given orders about their new
+    fulfillment status, built from one query.
+    """
+    orders = Order.objects.filter(id__in=order_ids).only('id', 'first_name', 'email')
+    return [
+        OutgoingEmail(
+            to=order.email,
+            subject=f'Order nr. {order.id}',
+            body=(
+                f'Dear {order.first_name},\n\n'
+                + STATUS_EMAILS[status].format(id=order.id)
+            )
+        )
+        for order in orders
+    ]
@@ -0,0 +1,162 @@
+"""
+Streaming order exports.
+Rows are read with a server-side iterator in chunks and written out as they
+are produced, so memory use stays flat and the first bytes are sent
+immediately whatever the number of orders.
+"""
+
+import csv
+import datetime
+from itertools import chain
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+
+from .models import Order, OrderItem
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Customer-facing order columns as (column name, lookup). Internal
+# fields such as the search copies, Checkout session data and stock
+# reservation are deliberately left out; new Order fields are not
+# exported until they are added here.
+ORDER_COLUMNS = [
+    ('id', 'id'),
+    ('first_name', 'first_name'),
+    ('last_name', 'last_name'),
+    ('email', 'email'),
+    ('address', 'address'),
+    ('postal_code', 'postal_code'),
+    ('city', 'city'),
+    ('created', 'created'),
+    ('updated', 'updated'),
+    ('paid', 'paid'),
+    ('status', 'status'),
+    ('coupon', 'coupon__code'),
+    ('discount', 'discount'),
+    ('subtotal', 'subtotal'),
+    ('discount_amount', 'discount_amount'),
+    ('shipping_cost', 'shipping_cost'),
+    ('total_weight', 'total_weight'),
+    ('total_cost', 'total_cost'),
+]
+
+ITEM_FIELDS = ['product_id', 'product_name', 'price', 'quantity']
+
+
+class Echo:
+    """
+    File-like object whose write() just returns the value, so csv.writer
+    can produce lines for a streaming response.
+    """
+    def write(self, value):
+        return value
+
+
+def as_batches(orders):
+    """
+    Accept a queryset or a list of querysets read one after the other.
+    """
+    return [orders] if isinstance(orders, QuerySet) else orders
+
+
+def iter_orders(queryset, include_items=False, chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+    """
+    Yield (order values dict, items list) pairs for the queryset, or for a
+    list of querysets in turn.
+
+    Orders are read as plain values with iterator(chunk_size=...); when
+    items are requested they are loaded with one query per chunk.
+    `progress`, if given, is called with the number of orders done after
+    every chunk.
+    """
+    names = [name for name, _ in ORDER_COLUMNS]
+    lookups = [lookup for _, lookup in ORDER_COLUMNS]
+    rows = chain.from_iterable(
+        batch.values_list(*lookups).iterator(chunk_size=chunk_size)
+        for batch in as_batches(queryset)
+    )
+
+    chunk = []
+    done = 0
+    for row in rows:
+        chunk.append(dict(zip(names, row)))
+        if len(chunk) == chunk_size:
+            yield from _with_items(chunk, include_items)
+            done += len(chunk)
+            chunk = []
+            if progress:
+                progress(done)
+    if chunk:
+        yield from _with_items(chunk, include_items)
+        if progress:
+            progress(done + len(chunk))
+
+
+def _with_items(chunk, include_items):
+    """
+    Attach the line items of a chunk of orders, fetched in a single query.
+    """
+    items = {}
+    if include_items:
+        order_ids = [order['id'] for order in chunk]
+        for item in OrderItem.objects.filter(order_id__in=order_ids).values(
+            'order_id', *ITEM_FIELDS
+        ).order_by('order_id', 'id'):
+            items.setdefault(item.pop('order_id'), []).append(item)
+    for order in chunk:
+        yield order, items.get(order['id'], [])
+
+
+def _format_csv_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%d/%m/%Y')
+    return value
+
+
+def stream_csv(queryset, include_items=False, progress=None):
+    """
+    Generate CSV lines for the orders. With items, every line item gets
+    its own row with the order columns repeated.
+    """
+    names = [name for name, _ in ORDER_COLUMNS]
+    writer = csv.writer(Echo())
+
+    header = list(names)
+    if include_items:
+        header += [f'item {name}' for name in ITEM_FIELDS]
+    yield writer.writerow(header)
+
+    for order, items in iter_orders(queryset, include_items, progress=progress):
+        row = [_format_csv_value(order[name]) for name in names]
+        if not include_items:
+            yield writer.writerow(row)
+            continue
+        for item in items or [{}]:
+            yield writer.writerow(row + [item.get(name, '') for name in ITEM_FIELDS])
+
+
+def stream_jsonl(queryset, include_items=False, progress=None):
+    """
+    Generate one JSON object per line for each order, optionally with its items.
+    """
+    encoder = DjangoJSONEncoder()
+    for order, items in iter_orders(queryset, include_items, progress=progress):
+        if include_items:
+            order['items'] = items
+        yield encoder.encode(order) + '\n'
+
+
+EXPORT_STREAMS = {
+    'csv': stream_csv,
+    'jsonl': stream_jsonl,
+}
+
+
+def write_export_file(queryset, export_format, include_items, fileobj, progress=None):
+    """
+    Write an export of the queryset into a binary file object, line by line.
+    """
+    stream = EXPORT_STREAMS[export_format]
+    for line in stream(queryset, include_items=include_items, progress=progress):
+        fileobj.write(line.encode('utf-8'))
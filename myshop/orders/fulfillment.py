@@ -0,0 +1,120 @@
+"""
+Order fulfillment status.
+
+Orders move pending -> paid -> packed -> shipped -> delivered and can be
+cancelled until they are shipped. Payment moves orders to paid; staff move
+them further in bulk from the admin or the transition_orders command.
+
+Orders are moved in batches: each batch is locked, moved with one UPDATE,
+logged with one bulk INSERT and its customer e-mails are queued with
+another, so thousands of orders move in a handful of statements.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from analytics.tasks import update_sales_rollups
+from mailer.dispatcher import queue_emails
+from payment.tasks import expire_checkout_sessions
+from .emails import STATUS_EMAILS, status_emails
+from .models import Order, OrderStatusChange
+from .reservations import release_reservations, return_stock
+
+Status = Order.Status
+
+BATCH_SIZE = 1000
+
+# Statuses an order may be moved to by staff, with the statuses it may
+# come from
+TRANSITIONS = {
+    Status.PACKED: [Status.PAID],
+    Status.SHIPPED: [Status.PACKED],
+    Status.DELIVERED: [Status.SHIPPED],
+    Status.CANCELLED: [Status.PENDING, Status.PAID, Status.PACKED],
+}
+
+
+def log_transitions(changes, to_status, changed, user=None, note=''):
+    """
+    Record the transitions of (order id, previous status) pairs with one
+    bulk INSERT.
+    """
+    OrderStatusChange.objects.bulk_create(
+        [
+            OrderStatusChange(
+                order_id=order_id,
+                from_status=from_status,
+                to_status=to_status,
+                changed=changed,
+                changed_by=user,
+                note=note,
+            )
+            for order_id, from_status in changes
+        ],
+        batch_size=BATCH_SIZE
+    )
+
+
+def _cancel(changes):
+    """
+    Give back the stock and coupon redemptions of cancelled orders, rebuild
+    the sales rollups of the paid ones and expire the Checkout sessions of
+    unpaid ones so they can no longer be paid. A payment that still gets through is refunded when its webhook
+    arrives (see payment.events.mark_orders_paid).
+    """
+    pending = [order_id for order_id, status in changes if status == Status.PENDING]
+    paid = [order_id for order_id, status in changes if status != Status.PENDING]
+    if pending:
+        # Only orders still holding their reservation have stock to return
+        release_reservations(Order.objects.filter(id__in=pending))
+        sessions = Order.objects.filter(id__in=pending).exclude(stripe_session_id='')
+        session_ids = list(sessions.values_list('stripe_session_id', flat=True))
+        sessions.update(
+            stripe_session_id='',
+            stripe_session_url='',
+            stripe_session_expires=None,
+            stripe_session_fingerprint=''
+        )
+        if session_ids:
+            transaction.on_commit(lambda: expire_checkout_sessions.delay(session_ids))
+    if paid:
+        return_stock(paid)
+        # Take their revenue out of the rollups of the days they were placed
+        transaction.on_commit(lambda: update_sales_rollups.delay(paid))
+
+
+def transition_orders(orders, to_status, user=None, note=''):
+    """
+    Move the orders of the queryset that may reach `to_status` there;
+    orders in other statuses, or locked by a payment, are skipped.
+    Returns the ids of the moved orders.
+    """
+    queryset = orders.filter(status__in=TRANSITIONS[to_status]).order_by('id')
+    moved = []
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            changes = list(
+                queryset.filter(id__gt=last_id)
+                .select_for_update(skip_locked=True)
+                .values_list('id', 'status')[:BATCH_SIZE]
+            )
+            if not changes:
+                break
+            order_ids = [order_id for order_id, _ in changes]
+            now = timezone.now()
+            Order.objects.filter(id__in=order_ids).update(
+                status=to_status,
+                status_changed=now,
+                updated=now
+            )
+            log_transitions(changes, to_status, now, user=user, note=note)
+            if to_status == Status.CANCELLED:
+                _cancel(changes)
+            if to_status in STATUS_EMAILS:
+                queue_emails(status_emails(order_ids, to_status))
+        moved += order_ids
+        last_id = order_ids[-1]
+        if len(changes) < BATCH_SIZE:
+            break
+    return moved
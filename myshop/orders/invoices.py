@@ -0,0 +1,275 @@
+"""
+PDF invoices.
+Invoices are rendered once per order version and language and stored in
+private storage (they hold the customer's name and address) under a
+content-addressed name built from the order id, its last update time,
+the active language and a hash of the invoice template and stylesheet.
+Any change to the order or to the template produces a new name, so
+stored files never need invalidating. Each language keeps its own
+current version, so renders in different languages do not evict each
+other.
+
+Bulk rendering converts the invoice HTML to PDF in a process pool, so
+large batches scale with the number of CPU cores. The pool is only
+started from Celery tasks and management commands, never while serving
+a request.
+"""
+
+import hashlib
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import batched, chain
+
+import weasyprint
+from weasyprint.text.fonts import FontConfiguration
+from django.contrib.staticfiles import finders
+from django.core.files.base import ContentFile
+from django.template.loader import get_template
+from django.utils.translation import get_language
+
+from .exports import as_batches
+from .models import private_storage
+
+INVOICE_TEMPLATE = 'orders/order/pdf.html'
+INVOICE_STYLESHEET = 'shop/css/pdf.css'
+
+# Orders read, rendered and stored per batch in bulk rendering
+INVOICE_BATCH_SIZE = 100
+
+
+@lru_cache(maxsize=None)
+def get_template_hash():
+    """
+    Hash of the invoice template and stylesheet sources, computed once per
+    process.
+    """
+    digest = hashlib.sha256()
+    digest.update(get_template(INVOICE_TEMPLATE).template.source.encode())
+    with open(finders.find(INVOICE_STYLESHEET), 'rb') as stylesheet:
+        digest.update(stylesheet.read())
+    return digest.hexdigest()
+
+
+def get_invoice_key(order):
+    """
+    Version key of an order's invoice; also used as its ETag.
+    """
+    version = f'{order.id}:{order.updated.isoformat()}:{get_language()}:{get_template_hash()}'
+    return hashlib.sha256(version.encode()).hexdigest()[:32]
+
+
+def get_invoice_path(order):
+    return f'invoices/{order.id}/{get_language()}-{get_invoice_key(order)}.pdf'
+
+
+class InvoiceRenderer:
+    """
+    Long-lived invoice renderer.
+    Parses the stylesheet, sets up fonts and compiles the template once and
+    reuses them for every invoice it renders.
+    """
+    def __init__(self):
+        self.font_config = FontConfiguration()
+        self.stylesheet = weasyprint.CSS(
+            filename=finders.find(INVOICE_STYLESHEET),
+            font_config=self.font_config
+        )
+        self.template = get_template(INVOICE_TEMPLATE)
+
+    def render_html(self, order):
+        return self.template.render({'order': order})
+
+    def write_pdf(self, html):
+        """
+        Convert invoice HTML into PDF bytes.
+        """
+        return weasyprint.HTML(string=html).write_pdf(
+            stylesheets=[self.stylesheet],
+            font_config=self.font_config
+        )
+
+    def render(self, order):
+        """
+        Render the PDF invoice for an order and return its bytes.
+        """
+        return self.write_pdf(self.render_html(order))
+
+    def render_many(self, orders):
+        """
+        Render invoices for several orders, yielding (order, pdf bytes).
+        """
+        for order in orders:
+            yield order, self.render(order)
+
+
+_local = threading.local()
+
+
+def get_renderer():
+    """
+    Return the invoice renderer of the current thread, creating it on
+    first use. Font configurations are not shared between threads.
+    """
+    renderer = getattr(_local, 'renderer', None)
+    if renderer is None:
+        renderer = _local.renderer = InvoiceRenderer()
+    return renderer
+
+
+def render_invoice(order):
+    """
+    Render the PDF invoice for an order and return its bytes.
+    """
+    return get_renderer().render(order)
+
+
+def get_invoice(order):
+    """
+    Return the storage path of the current invoice for an order, rendering
+    and storing it only if this version has not been rendered yet.
+    Older versions of the order's invoice are removed.
+    """
+    path = get_invoice_path(order)
+    if private_storage().exists(path):
+        return path
+
+    path = private_storage().save(path, ContentFile(render_invoice(order)))
+    _remove_stale_invoices(order)
+    return path
+
+
+def _remove_stale_invoices(order):
+    """
+    Delete stored invoices of previous versions of the order in the active
+    language.
+    """
+    directory = f'invoices/{order.id}'
+    current = get_invoice_path(order).rsplit('/', 1)[-1]
+    try:
+        _, filenames = private_storage().listdir(directory)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for filename in filenames:
+        if filename.startswith(f'{get_language()}-') and filename != current:
+            private_storage().delete(f'{directory}/{filename}')
+
+
+# ==============================================================================
+# BULK RENDERING
+# ==============================================================================
+
+def with_invoice_data(orders):
+    """
+    Prefetch everything the invoice template needs for a queryset of
+    orders in a fixed number of queries.
+    """
+    return orders.select_related('coupon').prefetch_related('items')
+
+
+# Per-process state of the pool workers. Workers only convert HTML to PDF
+# and never touch the database.
+_pool_font_config = None
+_pool_stylesheet = None
+
+
+def _init_pool_worker(stylesheet_path):
+    global _pool_font_config, _pool_stylesheet
+    _pool_font_config = FontConfiguration()
+    _pool_stylesheet = weasyprint.CSS(
+        filename=stylesheet_path,
+        font_config=_pool_font_config
+    )
+
+
+def _pool_write_pdf(html):
+    return weasyprint.HTML(string=html).write_pdf(
+        stylesheets=[_pool_stylesheet],
+        font_config=_pool_font_config
+    )
+
+
+def render_invoices(orders, max_workers=None, progress=None):
+    """
+    Yield (order, pdf bytes) for a queryset of orders, or a list of
+    querysets in turn.
+
+    Orders are handled in batches of INVOICE_BATCH_SIZE. Invoices already
+    stored for the current order version are reused. The rest have their
+    HTML rendered here (where the prefetched data lives) and converted to
+    PDF in parallel by a process pool of `max_workers` processes (defaults
+    to the number of CPUs); the results are stored and the previous
+    versions of those invoices removed after each batch. `progress`, if
+    given, is called with the number of orders done after every batch.
+    """
+    pool = None
+    done = 0
+    try:
+        orders = chain.from_iterable(
+            queryset.iterator(chunk_size=INVOICE_BATCH_SIZE) for queryset in as_batches(orders)
+        )
+        for batch in batched(orders, INVOICE_BATCH_SIZE):
+            pending = []
+            for order in batch:
+                path = get_invoice_path(order)
+                if private_storage().exists(path):
+                    with private_storage().open(path, 'rb') as invoice:
+                        yield order, invoice.read()
+                else:
+                    pending.append((order, path))
+
+            if pending:
+                if pool is None:
+                    pool = ProcessPoolExecutor(
+                        max_workers=max_workers,
+                        initializer=_init_pool_worker,
+                        initargs=(finders.find(INVOICE_STYLESHEET),)
+                    )
+                renderer = get_renderer()
+                html = [renderer.render_html(order) for order, _ in pending]
+                for (order, path), pdf in zip(pending, pool.map(_pool_write_pdf, html)):
+                    private_storage().save(path, ContentFile(pdf))
+                    yield order, pdf
+                for order, _ in pending:
+                    _remove_stale_invoices(order)
+
+            done += len(batch)
+            if progress:
+                progress(done)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+class _ZipSink:
+    """
+    Unseekable write target collecting the bytes zipfile produces.
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_invoices_zip(orders, max_workers=None, progress=None):
+    """
+    Generate a ZIP archive of the invoices of the orders chunk by chunk,
+    so it can be written out while the invoices are still being rendered.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for order, pdf in render_invoices(orders, max_workers, progress):
+            archive.writestr(f'order_{order.id}.pdf', pdf)
+            yield sink.pop()
+    yield sink.pop()
@@ -0,0 +1,36 @@
+"""
+Move old orders to the archive tables.
+
+Usage:
+    python manage.py archive_orders
+    python manage.py archive_orders --days 365 --batch-size 500
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders.archive import archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Move orders older than ORDER_ARCHIVE_DAYS to the archive tables in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.ORDER_ARCHIVE_DAYS,
+            help='Archive orders created more than this many days ago.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.ORDER_ARCHIVE_BATCH_SIZE,
+            help='Orders moved per transaction.'
+        )
+
+    def handle(self, *args, **options):
+        archived = archive_orders(options['days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} orders older than {options["days"]} days.'
+        ))
@@ -0,0 +1,62 @@
+"""
+Fill the product snapshot (name, language, weight) of order items created
+before snapshots were stored.
+
+Names are taken in the default language (settings.LANGUAGE_CODE), falling
+back to any available translation.
+
+Usage:
+    python manage.py backfill_order_item_snapshots
+    python manage.py backfill_order_item_snapshots --batch-size 5000
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders.models import OrderItem
+
+
+class Command(BaseCommand):
+    help = 'Store product name, language and weight snapshots on old order items.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of order items updated per query.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        language = settings.LANGUAGE_CODE
+        updated = 0
+        last_id = 0
+
+        while True:
+            # Walk the items by primary key; each batch costs one query for
+            # the items with their products, one for translations and one
+            # bulk update.
+            items = list(
+                OrderItem.objects.filter(id__gt=last_id, product_name='')
+                .select_related('product')
+                .prefetch_related('product__translations')
+                .order_by('id')[:batch_size]
+            )
+            if not items:
+                break
+
+            for item in items:
+                product = item.product
+                item.product_name = product.safe_translation_getter(
+                    'name', language_code=language, any_language=True
+                ) or ''
+                item.language_code = language
+                item.weight = product.weight
+            OrderItem.objects.bulk_update(
+                items, ['product_name', 'language_code', 'weight']
+            )
+            updated += len(items)
+            last_id = items[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} order items.'))
@@ -0,0 +1,134 @@
+"""
+Benchmark invoice rendering before and after the warm invoice renderer.
+
+"Before" re-parses the stylesheet and sets up fonts for every invoice, as
+the views and tasks used to. "After" uses one long-lived InvoiceRenderer.
+
+Two scenarios are measured:
+  - web: one invoice per request; the first render in a fresh process
+    includes the renderer setup, later ones reuse it.
+  - worker: a batch of invoices rendered with render_many().
+
+Sample orders are created (and rolled back) when the database has none.
+
+Usage:
+    python manage.py bench_invoice_render
+    python manage.py bench_invoice_render --orders 50
+"""
+
+import time
+from decimal import Decimal
+
+import weasyprint
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from orders.invoices import INVOICE_STYLESHEET, INVOICE_TEMPLATE, InvoiceRenderer
+from orders.models import Order, OrderItem
+from shop.models import Category, Product
+
+
+def render_legacy(order):
+    """
+    Render an invoice the way it was done before the warm renderer.
+    """
+    html = render_to_string(INVOICE_TEMPLATE, {'order': order})
+    return weasyprint.HTML(string=html).write_pdf(
+        stylesheets=[weasyprint.CSS(finders.find(INVOICE_STYLESHEET))]
+    )
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare per-invoice render time with and without the warm renderer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--orders',
+            type=int,
+            default=20,
+            help='Number of invoices to render per measurement.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                orders = list(
+                    Order.objects.filter(items__isnull=False).distinct()[:options['orders']]
+                )
+                if not orders:
+                    orders = self._create_sample_orders(options['orders'])
+                self._run(orders)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _run(self, orders):
+        count = len(orders)
+
+        # Web: first request in a fresh process, then one invoice per request
+        start = time.perf_counter()
+        render_legacy(orders[0])
+        before_first = time.perf_counter() - start
+        start = time.perf_counter()
+        renderer = InvoiceRenderer()
+        renderer.render(orders[0])
+        after_first = time.perf_counter() - start
+
+        before_web = self._time(lambda: [render_legacy(order) for order in orders])
+        after_web = self._time(lambda: [renderer.render(order) for order in orders])
+
+        # Worker: render the whole batch
+        before_worker = self._time(lambda: [render_legacy(order) for order in orders])
+        after_worker = self._time(lambda: list(InvoiceRenderer().render_many(orders)))
+
+        self.stdout.write(f'{count} invoices, times in ms per invoice')
+        self.stdout.write(f"{'scenario':<28} {'before':>9} {'after':>9} {'speedup':>8}")
+        for label, before, after in [
+            ('web, first request', before_first, after_first),
+            ('web, per request', before_web / count, after_web / count),
+            ('worker, batch', before_worker / count, after_worker / count),
+        ]:
+            self.stdout.write(
+                f'{label:<28} {before * 1000:>9.1f} {after * 1000:>9.1f} '
+                f'{before / after:>7.1f}x'
+            )
+
+    def _time(self, func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+
+    def _create_sample_orders(self, count):
+        category = Category.objects.create(name='Benchmark', slug='benchmark')
+        products = [
+            Product.objects.create(
+                category=category,
+                name=f'Benchmark product {i}',
+                slug=f'benchmark-product-{i}',
+                price=Decimal('9.99') + i
+            )
+            for i in range(5)
+        ]
+        orders = []
+        for i in range(count):
+            order = Order.objects.create(
+                first_name='Bench',
+                last_name=f'Customer {i}',
+                email='bench@example.com',
+                address='Bole Road',
+                postal_code='1000',
+                city='Addis Ababa'
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, price=product.price, quantity=2)
+                for product in products
+            ])
+            order.update_totals()
+            orders.append(order)
+        return orders
@@ -0,0 +1,82 @@
+"""
+Queue a background export of orders created in a date range.
+
+Usage:
+    python manage.py export_orders --from 2025-01-01 --to 2026-01-01
+    python manage.py export_orders --format jsonl --email ops@myshop.com
+    python manage.py export_orders --from 2025-01-01 --now
+"""
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orders.models import OrderExport
+from orders.tasks import export_orders
+
+
+def parse_date(value):
+    try:
+        date = datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD.')
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+class Command(BaseCommand):
+    help = 'Export orders to a compressed file in private storage via Celery.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from',
+            dest='created_from',
+            type=parse_date,
+            help='First creation date to include (YYYY-MM-DD).'
+        )
+        parser.add_argument(
+            '--to',
+            dest='created_to',
+            type=parse_date,
+            help='Creation date to stop before (YYYY-MM-DD).'
+        )
+        parser.add_argument(
+            '--format',
+            dest='export_format',
+            choices=OrderExport.Format.values,
+            default=OrderExport.Format.CSV
+        )
+        parser.add_argument(
+            '--no-items',
+            action='store_true',
+            help='Leave line items out of the export.'
+        )
+        parser.add_argument(
+            '--email',
+            default='',
+            help='Address to e-mail the download link to.'
+        )
+        parser.add_argument(
+            '--now',
+            action='store_true',
+            help='Run the export in this process instead of queueing it.'
+        )
+
+    def handle(self, *args, **options):
+        export = OrderExport.objects.create(
+            email=options['email'],
+            export_format=options['export_format'],
+            include_items=not options['no_items'],
+            created_from=options['created_from'],
+            created_to=options['created_to']
+        )
+
+        if options['now']:
+            export_orders(export.id)
+            export.refresh_from_db()
+            self.stdout.write(self.style.SUCCESS(
+                f'Exported {export.total} orders to {export.file.path}'
+            ))
+        else:
+            export_orders.delay(export.id)
+            self.stdout.write(self.style.SUCCESS(f'Queued order export {export.id}'))
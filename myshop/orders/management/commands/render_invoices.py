@@ -0,0 +1,57 @@
+"""
+Render the invoices of many orders in parallel into one ZIP file.
+
+Usage:
+    python manage.py render_invoices --from 2025-01-01 --to 2025-02-01 --output january.zip
+    python manage.py render_invoices --ids 12 15 18 --workers 4 --output invoices.zip
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.invoices import stream_invoices_zip, with_invoice_data
+from orders.models import Order
+from .export_orders import parse_date
+
+
+class Command(BaseCommand):
+    help = 'Render invoices for a set of orders with a process pool and write them to a ZIP file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', type=int, nargs='+', help='Order ids to include.')
+        parser.add_argument(
+            '--from',
+            dest='created_from',
+            type=parse_date,
+            help='First creation date to include (YYYY-MM-DD).'
+        )
+        parser.add_argument(
+            '--to',
+            dest='created_to',
+            type=parse_date,
+            help='Creation date to stop before (YYYY-MM-DD).'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Number of rendering processes (defaults to the CPU count).'
+        )
+        parser.add_argument('--output', required=True, help='Path of the ZIP file to write.')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.order_by('id')
+        if options['ids']:
+            orders = orders.filter(id__in=options['ids'])
+        if options['created_from']:
+            orders = orders.filter(created__gte=options['created_from'])
+        if options['created_to']:
+            orders = orders.filter(created__lt=options['created_to'])
+        if not (options['ids'] or options['created_from'] or options['created_to']):
+            raise CommandError('Select orders with --ids and/or --from/--to.')
+
+        with open(options['output'], 'wb') as out:
+            for chunk in stream_invoices_zip(with_invoice_data(orders), options['workers']):
+                out.write(chunk)
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {orders.count()} invoices to {options["output"]}'
+        ))
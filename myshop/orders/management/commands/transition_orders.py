@@ -0,0 +1,73 @@
+"""
+Move orders to a fulfillment status in bulk.
+
+Orders that cannot reach the status from their current one are skipped.
+
+Usage:
+    python manage.py transition_orders packed --status paid --to 2026-10-19
+    python manage.py transition_orders shipped --ids 12 15 18 --note "DHL pickup"
+    python manage.py transition_orders delivered --ids-file delivered.txt
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.fulfillment import TRANSITIONS, transition_orders
+from orders.models import Order
+from .export_orders import parse_date
+
+
+def read_ids(path):
+    try:
+        with open(path) as ids_file:
+            return [int(line) for line in ids_file if line.strip()]
+    except (OSError, ValueError) as exc:
+        raise CommandError(f'Cannot read order ids from "{path}": {exc}')
+
+
+class Command(BaseCommand):
+    help = 'Move orders to a fulfillment status with batched UPDATE statements.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', choices=[status.value for status in TRANSITIONS])
+        parser.add_argument('--ids', type=int, nargs='+', help='Order ids to move.')
+        parser.add_argument('--ids-file', help='File with one order id per line.')
+        parser.add_argument(
+            '--status',
+            choices=Order.Status.values,
+            help='Only move orders currently in this status.'
+        )
+        parser.add_argument(
+            '--from',
+            dest='created_from',
+            type=parse_date,
+            help='First creation date to include (YYYY-MM-DD).'
+        )
+        parser.add_argument(
+            '--to',
+            dest='created_to',
+            type=parse_date,
+            help='Creation date to stop before (YYYY-MM-DD).'
+        )
+        parser.add_argument('--note', default='', help='Note stored in the status log.')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        ids = options['ids'] or []
+        if options['ids_file']:
+            ids += read_ids(options['ids_file'])
+        if ids:
+            orders = orders.filter(id__in=ids)
+        if options['status']:
+            orders = orders.filter(status=options['status'])
+        if options['created_from']:
+            orders = orders.filter(created__gte=options['created_from'])
+        if options['created_to']:
+            orders = orders.filter(created__lt=options['created_to'])
+        if not (ids or options['status'] or options['created_from'] or options['created_to']):
+            raise CommandError('Select orders with --ids, --ids-file, --status and/or --from/--to.')
+
+        target = Order.Status(options['target'])
+        moved = transition_orders(orders, target, note=options['note'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Marked {len(moved)} orders as {target.label.lower()}.'
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0001_initial'),
+        ('orders', '0005_order_shipping_cost_order_total_weight'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='reserved_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['reserved_until'], name='orders_orde_reserve_96007e_idx'),
+        ),
+    ]
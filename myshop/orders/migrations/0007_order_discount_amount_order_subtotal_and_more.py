@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0001_initial'),
+        ('orders', '0006_order_reserved_until_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='discount_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['total_cost'], name='orders_orde_total_c_fa71d6_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:17
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def backfill_order_totals(apps, schema_editor):
+    """
+    Store subtotal, discount amount and total on existing orders.
+    """
+    Order = apps.get_model('orders', 'Order')
+    orders = Order.objects.annotate(
+        items_subtotal=Sum(
+            F('items__price') * F('items__quantity'),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2)
+        )
+    ).only('id', 'discount', 'shipping_cost').order_by('id')
+
+    batch = []
+    for order in orders.iterator(chunk_size=1000):
+        order.subtotal = order.items_subtotal or Decimal(0)
+        order.discount_amount = (
+            order.subtotal * Decimal(order.discount) / Decimal(100)
+        ).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        order.total_cost = order.subtotal - order.discount_amount + order.shipping_cost
+        batch.append(order)
+        if len(batch) == 1000:
+            Order.objects.bulk_update(batch, ['subtotal', 'discount_amount', 'total_cost'])
+            batch = []
+    if batch:
+        Order.objects.bulk_update(batch, ['subtotal', 'discount_amount', 'total_cost'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_order_discount_amount_order_subtotal_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_orderexport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='language_code',
+            field=models.CharField(blank=True, max_length=15),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_name',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='weight',
+            field=models.PositiveIntegerField(default=0, help_text='unit weight in grams'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0001_initial'),
+        ('orders', '0010_orderitem_language_code_orderitem_product_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='search_email',
+            field=models.CharField(blank=True, editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='search_first_name',
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='search_last_name',
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-updated'], name='orders_orde_updated_884768_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['paid', '-created'], name='orders_orde_paid_98e2fa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['paid', '-updated'], name='orders_orde_paid_bd3e35_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['search_first_name'], name='orders_orde_search__8704ba_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['search_last_name'], name='orders_orde_search__143a28_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['search_email'], name='orders_orde_search__b4feca_idx'),
+        ),
+    ]
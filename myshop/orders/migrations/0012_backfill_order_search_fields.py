@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:17
+
+from django.db import migrations
+
+
+def normalize(value):
+    return ' '.join(value.lower().split())
+
+
+def backfill_order_search_fields(apps, schema_editor):
+    """
+    Store the normalised search columns on existing orders.
+    """
+    Order = apps.get_model('orders', 'Order')
+    orders = Order.objects.only('id', 'first_name', 'last_name', 'email').order_by('id')
+    fields = ['search_first_name', 'search_last_name', 'search_email']
+
+    batch = []
+    for order in orders.iterator(chunk_size=1000):
+        order.search_first_name = normalize(order.first_name)
+        order.search_last_name = normalize(order.last_name)
+        order.search_email = normalize(order.email)
+        batch.append(order)
+        if len(batch) == 1000:
+            Order.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        Order.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0011_order_search_email_order_search_first_name_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_search_fields, migrations.RunPython.noop),
+    ]
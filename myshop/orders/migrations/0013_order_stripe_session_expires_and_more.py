@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_backfill_order_search_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stripe_session_expires',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='stripe_session_fingerprint',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='stripe_session_id',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='stripe_session_url',
+            field=models.URLField(blank=True, max_length=1000),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0005_backfill_coupon_times_redeemed'),
+        ('orders', '0013_order_stripe_session_expires_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('packed', 'Packed'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=10)),
+                ('to_status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('packed', 'Packed'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=10)),
+                ('changed', models.DateTimeField()),
+                ('note', models.CharField(blank=True, max_length=250)),
+            ],
+            options={
+                'ordering': ['-changed'],
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('packed', 'Packed'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='status_changed',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', '-created'], name='orders_orde_status_3885f4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', '-status_changed'], name='orders_orde_status_74990a_idx'),
+        ),
+        migrations.AddField(
+            model_name='orderstatuschange',
+            name='changed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_status_changes', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='orderstatuschange',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='orders.order'),
+        ),
+        migrations.AddIndex(
+            model_name='orderstatuschange',
+            index=models.Index(fields=['order', '-changed'], name='orders_orde_order_i_83547a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderstatuschange',
+            index=models.Index(fields=['to_status', '-changed'], name='orders_orde_to_stat_7fe2d0_idx'),
+        ),
+    ]
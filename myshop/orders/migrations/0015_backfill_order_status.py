@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:17
+
+from django.db import migrations
+from django.db.models import F
+
+
+def backfill_order_status(apps, schema_editor):
+    """
+    Mark existing paid orders as paid; unpaid ones stay pending.
+    """
+    Order = apps.get_model('orders', 'Order')
+    Order.objects.filter(paid=True).update(status='paid', status_changed=F('updated'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0014_order_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0005_backfill_coupon_times_redeemed'),
+        ('orders', '0015_backfill_order_status'),
+        ('shop', '0005_product_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('first_name', models.CharField(max_length=50, verbose_name='first_name')),
+                ('last_name', models.CharField(max_length=50, verbose_name='last_name')),
+                ('email', models.EmailField(max_length=254, verbose_name='e-mail')),
+                ('address', models.CharField(max_length=250, verbose_name='address')),
+                ('postal_code', models.CharField(max_length=20, verbose_name='postal_code')),
+                ('city', models.CharField(max_length=100, verbose_name='city')),
+                ('created', models.DateTimeField()),
+                ('updated', models.DateTimeField()),
+                ('paid', models.BooleanField(default=False)),
+                ('stripe_id', models.CharField(blank=True, max_length=250)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('packed', 'Packed'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=10)),
+                ('status_changed', models.DateTimeField(blank=True, null=True)),
+                ('discount', models.IntegerField(default=0)),
+                ('shipping_cost', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('total_weight', models.PositiveIntegerField(default=0)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('discount_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('total_cost', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('status_history', models.JSONField(blank=True, default=list)),
+                ('archived', models.DateTimeField(auto_now_add=True)),
+                ('coupon', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders', to='coupons.coupon')),
+            ],
+            options={
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('product_name', models.CharField(blank=True, max_length=200)),
+                ('language_code', models.CharField(blank=True, max_length=15)),
+                ('weight', models.PositiveIntegerField(default=0, help_text='unit weight in grams')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='orders.archivedorder')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_order_items', to='shop.product')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['-created'], name='orders_arch_created_1e2304_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['email'], name='orders_arch_email_7babaf_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0016_archived_orders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stripe_refund_id',
+            field=models.CharField(blank=True, max_length=250),
+        ),
+    ]
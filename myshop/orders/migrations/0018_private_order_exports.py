@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:57
+
+import secrets
+
+import orders.models
+from django.core.files.storage import default_storage, storages
+from django.db import migrations, models
+
+
+def move_exports_to_private_storage(apps, schema_editor):
+    """
+    Move export files written to media storage under their guessable
+    names into private storage under random ones.
+    """
+    OrderExport = apps.get_model('orders', 'OrderExport')
+    private = storages['private']
+    exports = OrderExport.objects.exclude(file='')
+    for export in exports:
+        if not default_storage.exists(export.file.name):
+            OrderExport.objects.filter(id=export.id).update(file='')
+            continue
+        name = f'exports/{secrets.token_urlsafe(24)}.{export.export_format}.gz'
+        with default_storage.open(export.file.name, 'rb') as content:
+            name = private.save(name, content)
+        default_storage.delete(export.file.name)
+        OrderExport.objects.filter(id=export.id).update(file=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0017_order_stripe_refund_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orderexport',
+            name='file',
+            field=models.FileField(blank=True, storage=orders.models.private_storage, upload_to=orders.models.export_file_path),
+        ),
+        migrations.RunPython(move_exports_to_private_storage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0007_coupon_code_normalized_unique'),
+        ('orders', '0018_private_order_exports'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='orders_orde_search__8704ba_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='orders_orde_search__143a28_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='orders_orde_search__b4feca_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['search_first_name'], name='orders_search_first_name_like', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['search_last_name'], name='orders_search_last_name_like', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['search_email'], name='orders_search_email_like', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
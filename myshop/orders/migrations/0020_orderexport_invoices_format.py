@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0019_order_search_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orderexport',
+            name='export_format',
+            field=models.CharField(choices=[('csv', 'CSV'), ('jsonl', 'JSONL'), ('invoices', 'PDF invoices (ZIP)')], default='csv', max_length=10),
+        ),
+    ]
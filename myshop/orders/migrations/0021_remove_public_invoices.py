@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:17
+
+from django.core.files.storage import default_storage
+from django.db import migrations
+
+
+def remove_public_invoices(apps, schema_editor):
+    """
+    Delete the invoices cached in media storage. They are a cache and are
+    rendered again into private storage when next requested.
+    """
+    try:
+        directories, _ = default_storage.listdir('invoices')
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for directory in directories:
+        _, filenames = default_storage.listdir(f'invoices/{directory}')
+        for filename in filenames:
+            default_storage.delete(f'invoices/{directory}/{filename}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0020_orderexport_invoices_format'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_public_invoices, migrations.RunPython.noop),
+    ]
@@ -2,13 +2,18 @@
 Models for the orders application.
 Defines the Order and OrderItem structures to manage customer purchases.
 """
-from decimal import Decimal
+import secrets
+from decimal import Decimal, ROUND_HALF_UP
+from django.core.files.storage import storages
 from django.db import models
+from django.db.models import F, Sum
 from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.utils.translation import gettext_lazy as _
+from django.utils.translation import get_language, gettext_lazy as _
 
 from coupons.models import Coupon
+from .search import SEARCH_FIELDS, set_search_fields
+from shop.shipping import items_weight, shipping_cost
 
 # ==============================================================================
 # ORDER MODEL
@@ -18,6 +23,14 @@ class Order(models.Model):
     """
     Stores customer information and the overall status of an order.
     """
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        PAID = 'paid', _('Paid')
+        PACKED = 'packed', _('Packed')
+        SHIPPED = 'shipped', _('Shipped')
+        DELIVERED = 'delivered', _('Delivered')
+        CANCELLED = 'cancelled', _('Cancelled')
+
     first_name = models.CharField(_('first_name'),max_length=50)
     last_name = models.CharField(_('last_name'),max_length=50)
     email = models.EmailField(_('e-mail'),)
@@ -32,6 +45,22 @@ class Order(models.Model):
     # Payment status
     paid = models.BooleanField(default=False)
     stripe_id = models.CharField(max_length=250, blank=True)
+    # Refund of a payment that arrived after the order was cancelled
+    stripe_refund_id = models.CharField(max_length=250, blank=True)
+
+    # Fulfillment status, changed in bulk through orders.fulfillment
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    status_changed = models.DateTimeField(null=True, blank=True)
+
+    # Open Stripe Checkout session, reused while the order is unchanged
+    stripe_session_id = models.CharField(max_length=255, blank=True)
+    stripe_session_url = models.URLField(max_length=1000, blank=True)
+    stripe_session_expires = models.DateTimeField(null=True, blank=True)
+    stripe_session_fingerprint = models.CharField(max_length=64, blank=True)
     
     coupon = models.ForeignKey(
         Coupon,
@@ -51,50 +80,130 @@ class Order(models.Model):
         default=0
     )
     total_weight = models.PositiveIntegerField(default=0)
+
+    # Stored totals, kept in sync with the items (see update_totals)
+    subtotal = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0
+    )
+    discount_amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0
+    )
+    total_cost = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0
+    )
+
+    # Stock held for this order until it is paid or the hold expires.
+    # Empty once the reservation was confirmed by payment or released.
+    reserved_until = models.DateTimeField(null=True, blank=True)
+
+    # Normalised copies of the customer fields for indexed admin search
+    search_first_name = models.CharField(max_length=50, blank=True, editable=False)
+    search_last_name = models.CharField(max_length=50, blank=True, editable=False)
+    search_email = models.CharField(max_length=254, blank=True, editable=False)
     
     def get_total_weight(self):
-        return sum(
-            item.product.weight * item.quantity
-            for item in self.items.all()
-        )
+        """
+        Total weight in grams of all items, from their weight snapshots,
+        using a single aggregate query.
+        """
+        return items_weight(self.items.all())
         
     def calculate_shipping(self):
-        weight = self.get_total_weight()
-        if weight == 0:
-            return Decimal('0.00')
-        
-        if weight <=1000:
-            return Decimal('5.00')
-        elif weight <= 5000:
-            return Decimal('10.00')
-        return Decimal('20.00')
+        return shipping_cost(self.get_total_weight())
     
     class Meta:
         ordering = ['-created']
         indexes = [
             models.Index(fields=['-created']),
+            models.Index(fields=['reserved_until']),
+            models.Index(fields=['total_cost']),
+            models.Index(fields=['-updated']),
+            models.Index(fields=['paid', '-created']),
+            models.Index(fields=['paid', '-updated']),
+            models.Index(fields=['status', '-created']),
+            models.Index(fields=['status', '-status_changed']),
+            # Prefix search (orders.search); the operator class lets
+            # PostgreSQL use the index for LIKE 'term%' under any collation
+            # and is ignored by other databases
+            models.Index(
+                fields=['search_first_name'],
+                name='orders_search_first_name_like',
+                opclasses=['varchar_pattern_ops']
+            ),
+            models.Index(
+                fields=['search_last_name'],
+                name='orders_search_last_name_like',
+                opclasses=['varchar_pattern_ops']
+            ),
+            models.Index(
+                fields=['search_email'],
+                name='orders_search_email_like',
+                opclasses=['varchar_pattern_ops']
+            ),
         ]
 
     def __str__(self):
         return f'Order {self.id}'
 
+    def save(self, *args, **kwargs):
+        """
+        Derive the discount amount and grand total from the stored subtotal
+        whenever one of their inputs is saved, and keep the search columns
+        in sync with the customer fields.
+        """
+        self.apply_totals()
+        set_search_fields(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if {'subtotal', 'discount', 'shipping_cost'} & update_fields:
+                update_fields |= {'discount_amount', 'total_cost'}
+            update_fields |= {
+                column for field, column in SEARCH_FIELDS.items() if field in update_fields
+            }
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+    def apply_totals(self):
+        """
+        Compute discount amount and total from subtotal, discount and shipping.
+        """
+        subtotal = Decimal(self.subtotal)
+        self.discount_amount = (
+            subtotal * Decimal(self.discount) / Decimal(100)
+        ).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        self.total_cost = subtotal - self.discount_amount + Decimal(self.shipping_cost)
+
+    def update_totals(self):
+        """
+        Recompute the stored subtotal from the items with a single aggregate
+        query and save the totals.
+        """
+        self.subtotal = self.items.aggregate(
+            subtotal=Sum(
+                F('price') * F('quantity'),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2)
+            )
+        )['subtotal'] or Decimal(0)
+        self.save(update_fields=['subtotal', 'updated'])
+
     def get_total_cost(self):
         """
-        Calculates the total cost of the order (sum of all items).
+        Returns the stored grand total (items - discount + shipping).
         """
-        total_cost = self.get_total_cost_before_discount()
-        total_cost -=self.get_discount()
-        total_cost +=self.shipping_cost
-        return total_cost
+        return self.total_cost
     
     def get_total_cost_before_discount(self):
-        return sum(item.get_cost() for item in self.items.all())
+        return self.subtotal
     
     def get_discount(self):
-        total_cost = self.get_total_cost_before_discount()
-        if self.discount:
-            return total_cost * (self.discount/Decimal(100))
-        return Decimal(0)
+        return self.discount_amount
 
     def get_stripe_url(self):
         """
@@ -133,9 +242,36 @@ class OrderItem(models.Model):
     )
     quantity = models.PositiveIntegerField(default=1)
 
+    # Snapshot of the product when the order was placed, so invoices and
+    # payments render without product/translation joins and stay correct
+    # if the product changes later.
+    product_name = models.CharField(max_length=200, blank=True)
+    language_code = models.CharField(max_length=15, blank=True)
+    weight = models.PositiveIntegerField(default=0, help_text='unit weight in grams')
+
     def __str__(self):
         return str(self.id)
 
+    def take_snapshot(self, product=None):
+        """
+        Copy name (in the active language) and weight from the product.
+        """
+        product = product or self.product
+        self.product_name = product.name
+        self.language_code = get_language() or settings.LANGUAGE_CODE
+        self.weight = product.weight
+
+    def save(self, *args, **kwargs):
+        if not self.product_name:
+            self.take_snapshot()
+        super().save(*args, **kwargs)
+        self.order.update_totals()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.order.update_totals()
+        return result
+
     def get_cost(self):
         """
         Calculates the cost of this specific line item.
@@ -143,3 +279,229 @@ class OrderItem(models.Model):
         return self.price * self.quantity
     
             
+
+
+# ==============================================================================
+# ORDER STATUS LOG MODEL
+# ==============================================================================
+
+class OrderStatusChange(models.Model):
+    """
+    One fulfillment status transition of an order.
+    """
+    order = models.ForeignKey(
+        Order,
+        related_name='status_changes',
+        on_delete=models.CASCADE
+    )
+    from_status = models.CharField(max_length=10, choices=Order.Status.choices)
+    to_status = models.CharField(max_length=10, choices=Order.Status.choices)
+    changed = models.DateTimeField()
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='order_status_changes',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL
+    )
+    note = models.CharField(max_length=250, blank=True)
+
+    class Meta:
+        ordering = ['-changed']
+        indexes = [
+            models.Index(fields=['order', '-changed']),
+            models.Index(fields=['to_status', '-changed']),
+        ]
+
+    def __str__(self):
+        return f'Order {self.order_id}: {self.from_status} -> {self.to_status}'
+
+
+# ==============================================================================
+# ARCHIVE MODELS
+# ==============================================================================
+
+class ArchivedOrder(models.Model):
+    """
+    An old order moved out of the Order table by orders.archive, with the
+    same id. Archived orders are read-only; the fields are those of Order
+    that invoices, the admin and reports still need, and the status log
+    is kept as a list in status_history.
+    """
+    id = models.IntegerField(primary_key=True)
+    first_name = models.CharField(_('first_name'), max_length=50)
+    last_name = models.CharField(_('last_name'), max_length=50)
+    email = models.EmailField(_('e-mail'))
+    address = models.CharField(_('address'), max_length=250)
+    postal_code = models.CharField(_('postal_code'), max_length=20)
+    city = models.CharField(_('city'), max_length=100)
+    created = models.DateTimeField()
+    updated = models.DateTimeField()
+    paid = models.BooleanField(default=False)
+    stripe_id = models.CharField(max_length=250, blank=True)
+    status = models.CharField(max_length=10, choices=Order.Status.choices)
+    status_changed = models.DateTimeField(null=True, blank=True)
+    coupon = models.ForeignKey(
+        Coupon,
+        related_name='archived_orders',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL
+    )
+    discount = models.IntegerField(default=0)
+    shipping_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total_weight = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    status_history = models.JSONField(default=list, blank=True)
+    archived = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [
+            models.Index(fields=['-created']),
+            models.Index(fields=['email']),
+        ]
+
+    def __str__(self):
+        return f'Order {self.id} (archived)'
+
+    # Same display helpers as live orders
+    get_stripe_url = Order.get_stripe_url
+    get_total_cost = Order.get_total_cost
+
+
+class ArchivedOrderItem(models.Model):
+    """
+    Line item of an archived order.
+    """
+    order = models.ForeignKey(
+        ArchivedOrder,
+        related_name='items',
+        on_delete=models.CASCADE
+    )
+    product = models.ForeignKey(
+        'shop.Product',
+        related_name='archived_order_items',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL
+    )
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField(default=1)
+    product_name = models.CharField(max_length=200, blank=True)
+    language_code = models.CharField(max_length=15, blank=True)
+    weight = models.PositiveIntegerField(default=0, help_text='unit weight in grams')
+
+    def __str__(self):
+        return str(self.id)
+
+    get_cost = OrderItem.get_cost
+
+
+# ==============================================================================
+# ORDER EXPORT JOB MODEL
+# ==============================================================================
+
+# Selected order ids looked up per query; SQLite allows 32766 parameters
+EXPORT_ID_CHUNK_SIZE = 10000
+
+
+def private_storage():
+    return storages['private']
+
+
+def export_file_path(instance, filename):
+    """
+    Random, unguessable name for an export file.
+    """
+    return f'exports/{secrets.token_urlsafe(24)}.{instance.get_file_extension()}'
+
+
+class OrderExport(models.Model):
+    """
+    A background export of orders, or of their PDF invoices, to a
+    compressed file in private storage outside MEDIA_ROOT; staff download
+    it through the admin_order_export_download view.
+    The export runs as a Celery task that reports its progress here.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    class Format(models.TextChoices):
+        CSV = 'csv', 'CSV'
+        JSONL = 'jsonl', 'JSONL'
+        INVOICES = 'invoices', 'PDF invoices (ZIP)'
+
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='order_exports',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL
+    )
+    email = models.EmailField(blank=True, help_text='Where to send the download link')
+    export_format = models.CharField(max_length=10, choices=Format.choices, default=Format.CSV)
+    include_items = models.BooleanField(default=True)
+
+    # Selection: an explicit list of order ids, or a creation date range
+    order_ids = models.JSONField(null=True, blank=True)
+    created_from = models.DateTimeField(null=True, blank=True)
+    created_to = models.DateTimeField(null=True, blank=True)
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to=export_file_path, storage=private_storage, blank=True)
+    error = models.TextField(blank=True)
+
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created']
+
+    def __str__(self):
+        return f'Order export {self.id}'
+
+    def get_file_extension(self):
+        if self.export_format == self.Format.INVOICES:
+            return 'zip'
+        return f'{self.export_format}.gz'
+
+    def get_download_name(self):
+        return f'orders_{self.id}.{self.get_file_extension()}'
+
+    def get_orders(self):
+        """
+        Returns the orders selected for this export as a list of querysets
+        to read one after the other, in id order. Explicit ids are looked
+        up in chunks of EXPORT_ID_CHUNK_SIZE, so large selections stay
+        below the database's limit on query parameters.
+        """
+        orders = Order.objects.order_by('id')
+        if self.created_from:
+            orders = orders.filter(created__gte=self.created_from)
+        if self.created_to:
+            orders = orders.filter(created__lt=self.created_to)
+        if self.order_ids is None:
+            return [orders]
+        order_ids = sorted(self.order_ids)
+        return [
+            orders.filter(id__in=order_ids[start:start + EXPORT_ID_CHUNK_SIZE])
+            for start in range(0, len(order_ids), EXPORT_ID_CHUNK_SIZE)
+        ]
+
+    def get_progress(self):
+        """
+        Percentage of orders written so far.
+        """
+        if self.status == self.Status.DONE:
+            return 100
+        if not self.total:
+            return 0
+        return min(100, self.processed * 100 // self.total)
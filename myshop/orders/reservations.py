@@ -0,0 +1,117 @@
+"""
+Stock reservations held by unpaid orders.
+
+Checkout takes the ordered quantities out of stock and stamps the order
+with ``reserved_until``. The reservation is either confirmed by payment
+(the stock stays sold) or released when it expires or its Stripe Checkout
+session expires (the stock goes back).
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from coupons.redemptions import release_orders
+from shop.inventory import reserve_stock, restock, take_stock
+from .models import Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+
+def reservation_deadline():
+    """
+    Return the moment a reservation made now expires.
+    """
+    return timezone.now() + timedelta(minutes=settings.ORDER_RESERVATION_MINUTES)
+
+
+def reserve_order(order, lines):
+    """
+    Reserve stock for the (product, quantity) lines of an order.
+    Raises OutOfStock when any line cannot be reserved. The caller saves
+    the order.
+    """
+    reserve_stock(lines)
+    order.reserved_until = reservation_deadline()
+
+
+def release_reservations(orders):
+    """
+    Give back the stock and coupon redemptions held by the unpaid orders
+    in the given queryset.
+
+    Orders are claimed by clearing ``reserved_until`` before restocking, so
+    the expiry task and the webhook never release the same order twice.
+    Returns the number of released orders.
+    """
+    with transaction.atomic():
+        order_ids = list(
+            orders.filter(paid=False, reserved_until__isnull=False)
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)
+        )
+        if not order_ids:
+            return 0
+        Order.objects.filter(id__in=order_ids).update(reserved_until=None)
+        return_stock(order_ids)
+    return len(order_ids)
+
+
+def return_stock(order_ids):
+    """
+    Put the items of the given orders back in stock and give back their
+    coupon redemptions.
+    """
+    quantities = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values('product_id')
+        .annotate(quantity=Sum('quantity'))
+    )
+    restock({row['product_id']: row['quantity'] for row in quantities})
+    release_orders(order_ids)
+
+
+def release_expired_reservations():
+    """
+    Release the reservations of all unpaid orders whose hold has expired.
+    """
+    return release_reservations(
+        Order.objects.filter(reserved_until__lt=timezone.now())
+    )
+
+
+def confirm_reservations(orders):
+    """
+    Keep the stock held by orders that have just been paid. The orders
+    must be locked by the caller (select_for_update).
+
+    Orders whose reservation had already expired and been released take
+    the stock again on a best-effort basis: their quantities are summed
+    per product and taken with one conditional UPDATE per product, and a
+    shortfall is logged.
+    """
+    lapsed = [order.id for order in orders if order.reserved_until is None]
+    Order.objects.filter(
+        id__in=[order.id for order in orders],
+        reserved_until__isnull=False
+    ).update(reserved_until=None)
+    for order in orders:
+        order.reserved_until = None
+    if not lapsed:
+        return
+
+    quantities = (
+        OrderItem.objects.filter(order_id__in=lapsed, product__stock__isnull=False)
+        .values('product_id')
+        .annotate(quantity=Sum('quantity'))
+    )
+    short = take_stock({row['product_id']: row['quantity'] for row in quantities})
+    if short:
+        logger.warning(
+            'Orders %s were paid after their reservation expired; not enough stock for: %s',
+            lapsed, ', '.join(str(product_id) for product_id in short)
+        )
@@ -0,0 +1,79 @@
+"""
+Indexed order search for the admin.
+
+Orders keep lowercased copies of the customer's first name, last name and
+e-mail in indexed columns. A search term matches orders whose normalised
+first name, last name or e-mail starts with it (or whose id equals it).
+Both sides are lowercased, so the prefix match is case-insensitive
+without depending on the database collation:
+
+- on PostgreSQL it is a LIKE 'term%' match, served by the
+  varchar_pattern_ops indexes of the columns under any collation
+- on SQLite, whose LIKE is case-insensitive and cannot use the plain
+  indexes, it is the index range term <= column < next(term); SQLite
+  compares text byte by byte, so the range holds exactly the values
+  starting with the term
+- other databases get the LIKE match, which may scan the table
+"""
+
+from django.db import connections
+from django.db.models import Q
+
+# Maps each searchable field to its normalised, indexed column
+SEARCH_FIELDS = {
+    'first_name': 'search_first_name',
+    'last_name': 'search_last_name',
+    'email': 'search_email',
+}
+
+
+def normalize(value):
+    """
+    Normalised form of a value used for searching: trimmed, lowercased and
+    with runs of whitespace collapsed.
+    """
+    return ' '.join(value.lower().split())
+
+
+def set_search_fields(order):
+    """
+    Refresh the normalised search columns of an order in memory.
+    """
+    for field, column in SEARCH_FIELDS.items():
+        setattr(order, column, normalize(getattr(order, field)))
+
+
+def prefix_end(term):
+    """
+    Smallest string greater than every string starting with the term, in
+    code point (and UTF-8 byte) order, or None if there is none.
+    """
+    for index in range(len(term) - 1, -1, -1):
+        if ord(term[index]) < 0x10FFFF:
+            return term[:index] + chr(ord(term[index]) + 1)
+    return None
+
+
+def prefix_q(column, term, vendor):
+    # The term is normalised like the column, so these match regardless
+    # of case
+    end = prefix_end(term)
+    if vendor == 'sqlite' and end is not None:
+        return Q(**{f'{column}__gte': term, f'{column}__lt': end})
+    return Q(**{f'{column}__startswith': term})
+
+
+def search_orders(queryset, search_term):
+    """
+    Filter orders by a search string. Every word must match the start of
+    the first name, last name or e-mail, or be the order id.
+    """
+    vendor = connections[queryset.db].vendor
+    for term in normalize(search_term).split():
+        condition = Q()
+        for column in SEARCH_FIELDS.values():
+            condition |= prefix_q(column, term, vendor)
+        if term.isdigit():
+            condition |= Q(id=int(term))
+        queryset = queryset.filter(condition)
+    return queryset
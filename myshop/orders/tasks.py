@@ -1,42 +1,115 @@
 """
 Asynchronous tasks for the orders application.
-Handles background processes like sending confirmation emails.
+Handles background processes like reservation expiry, order exports and
+archiving.
 """
 
+import gzip
+import tempfile
+
 from celery import shared_task
 
 # Django imports
-from django.core.mail import send_mail
+from django.conf import settings
+from django.core.files import File
+from django.urls import reverse
+from django.utils import timezone
 
 # Local imports
-from .models import Order
+from mailer.dispatcher import queue_emails
+from mailer.models import OutgoingEmail
+from .archive import archive_orders
+from .exports import write_export_file
+from .invoices import stream_invoices_zip, with_invoice_data
+from .models import Order, OrderExport
+from .reservations import release_expired_reservations
 
 # ==============================================================================
 # ASYNCHRONOUS TASKS
 # ==============================================================================
 
 @shared_task
-def order_created(order_id):
+def expire_reservations():
     """
-    Task to send an email notification when an order is successfully created.
+    Periodic task that gives back the stock held by unpaid orders whose
+    reservation has expired.
     """
-    # 1. Retrieve order details
-    order = Order.objects.get(id=order_id)
-    
-    # 2. Compose the email
-    subject = f'Order nr. {order_id}'
-    message = (
-        f'Dear {order.first_name},\n\n'
-        f'You have successfully placed an order. '
-        f'Your order ID is {order.id}.'
-    )
-    
-    # 3. Send the email
-    mail_sent = send_mail(
-        subject,
-        message,
-        'admin@myshop.com',
-        [order.email]
+    return release_expired_reservations()
+
+
+@shared_task
+def archive_old_orders():
+    """
+    Periodic task moving orders older than ORDER_ARCHIVE_DAYS to the
+    archive tables.
+    """
+    return archive_orders()
+
+
+@shared_task
+def export_orders(export_id):
+    """
+    Task to write an order export to a gzip file, or the orders' invoices
+    to a ZIP file, in private storage, reporting progress, and to e-mail
+    the download link when it is ready. Invoices are rendered with the
+    process pool of orders.invoices here, in the worker.
+    """
+    export = OrderExport.objects.get(id=export_id)
+    orders = export.get_orders()
+    OrderExport.objects.filter(id=export_id).update(
+        status=OrderExport.Status.RUNNING,
+        total=sum(batch.count() for batch in orders)
     )
-    
-    return mail_sent
\ No newline at end of file
+
+    def progress(done):
+        OrderExport.objects.filter(id=export_id).update(processed=done)
+
+    try:
+        # Compress into a local temporary file, then hand it to the storage
+        # backend, which copies it in chunks.
+        with tempfile.TemporaryFile() as tmp:
+            if export.export_format == OrderExport.Format.INVOICES:
+                # PDFs are already compressed; the ZIP only stores them
+                orders = [with_invoice_data(batch) for batch in orders]
+                for chunk in stream_invoices_zip(orders, progress=progress):
+                    tmp.write(chunk)
+            else:
+                with gzip.GzipFile(fileobj=tmp, mode='wb') as out:
+                    write_export_file(
+                        orders,
+                        export.export_format,
+                        export.include_items,
+                        out,
+                        progress=progress
+                    )
+            tmp.seek(0)
+            export.file.save(
+                export.get_download_name(),
+                File(tmp),
+                save=False
+            )
+    except Exception as exc:
+        OrderExport.objects.filter(id=export_id).update(
+            status=OrderExport.Status.FAILED,
+            error=str(exc),
+            finished=timezone.now()
+        )
+        raise
+
+    export.refresh_from_db(fields=['total', 'processed'])
+    export.status = OrderExport.Status.DONE
+    export.finished = timezone.now()
+    export.save(update_fields=['file', 'status', 'finished'])
+
+    # Let the requester know the file is ready
+    if export.email:
+        url = settings.SITE_URL + reverse(
+            'orders:admin_order_export_download', args=[export.id]
+        )
+        queue_emails([
+            OutgoingEmail(
+                to=export.email,
+                subject=f'Order export {export.id} is ready',
+                body=f'Your export of {export.total} orders is ready for download:\n{url}'
+            )
+        ])
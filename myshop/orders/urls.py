@@ -30,4 +30,11 @@ urlpatterns = [
         views.admin_order_pdf,
         name='admin_order_pdf'
     ),
+
+    # Download of a finished background order export
+    path(
+        'admin/export/<int:export_id>/download/',
+        views.admin_order_export_download,
+        name='admin_order_export_download'
+    ),
 ]
\ No newline at end of file
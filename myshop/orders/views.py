@@ -1,23 +1,90 @@
 """
 Order management views.
-Handles order creation, admin details, and PDF invoice generation.
+Handles order creation, admin details, and cached PDF invoices.
 """
 
 # Django imports
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
-from django.template.loader import render_to_string
-from django.contrib.staticfiles import finders
-from django.http import HttpResponse
-
-# Third-party imports
-import weasyprint
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.template.defaultfilters import floatformat
+from django.utils.translation import gettext as _
 
 # Local app imports
 from .forms import OrderCreateForm
-from .models import OrderItem, Order
-from .tasks import order_created
+from .archive import get_order_or_archived
+from .checkout import place_order
+from .emails import order_created_email
+from .invoices import get_invoice, get_invoice_key
+from .models import Order, OrderExport, private_storage
 from cart.cart import Cart
+from coupons.redemptions import RedemptionLimitReached
+from mailer.dispatcher import queue_emails
+from shop.inventory import OutOfStock
+
+
+# ==============================================================================
+# HELPERS
+# ==============================================================================
+
+def _format_price(value):
+    """
+    Format an amount the way the templates show prices.
+    """
+    return f'${floatformat(value, 2)}'
+
+
+def _notify_cart_changes(request, report):
+    """
+    Tell the customer which cart lines changed during reconciliation.
+    """
+    for product in report['unavailable']:
+        messages.warning(
+            request,
+            _('"%(name)s" is no longer available and was removed from your cart.')
+            % {'name': product.name}
+        )
+    if report['removed']:
+        messages.warning(
+            request,
+            _('Some products in your cart no longer exist and were removed.')
+        )
+    for product, old_price, new_price in report['repriced']:
+        messages.warning(
+            request,
+            _('The price of "%(name)s" changed from %(old)s to %(new)s.')
+            % {
+                'name': product.name,
+                'old': _format_price(old_price),
+                'new': _format_price(new_price),
+            }
+        )
+
+
+def _notify_out_of_stock(request, exc):
+    """
+    Tell the customer which products cannot be reserved.
+    """
+    for product in exc.products:
+        messages.error(
+            request,
+            _('Only %(stock)s of "%(name)s" left in stock.')
+            % {'stock': product.stock, 'name': product.name}
+        )
+
+
+def _notify_coupon_used_up(request, exc):
+    """
+    Tell the customer the coupon can no longer be used and remove it from
+    the cart.
+    """
+    request.session['coupon_id'] = None
+    if exc.per_customer:
+        message = _('You have already used the coupon "%(code)s".')
+    else:
+        message = _('The coupon "%(code)s" is no longer available.')
+    messages.error(request, message % {'code': exc.coupon.code})
 
 
 # ==============================================================================
@@ -27,44 +94,39 @@ from cart.cart import Cart
 def order_create(request):
     """
     Handles the checkout process. 
-    Saves order details, creates line items, and clears the cart.
+    Reconciles the cart, places the order through the checkout service,
+    and clears the cart.
     """
     cart = Cart(request)
-    # Materialize cart once so stale/deleted products are dropped consistently.
+    # Check all lines against current prices and availability in one query,
+    # so the order is never priced from stale session data.
+    report = cart.reconcile()
+    _notify_cart_changes(request, report)
     cart_items = list(cart)
     if not cart_items:
         return redirect('cart:cart_detail')
 
     if request.method == 'POST':
         form = OrderCreateForm(request.POST)
-        if form.is_valid():
-            # 1. Save the initial order and apply discount
-            order = form.save(commit=False)
-            
-            if cart.coupon:
-                order.coupon = cart.coupon
-                order.discount = cart.coupon.discount
-            order.save()
-            
-            # 2. Create OrderItem instances for each product in the cart
-            for item in cart_items:
-                OrderItem.objects.create(
-                    order=order,
-                    product=item['product'],
-                    price=item['price'],
-                    quantity=item['quantity']
-                )
-            # Calculate and freeze shipping    
-            order.total_weight = order.get_total_weight()
-            order.shipping_cost = order.calculate_shipping()
-            order.save()
-            # 3. Clear the session cart
+        # If the cart changed, show the updated totals before placing the order.
+        if form.is_valid() and not any(report.values()):
+            # 1. Reserve stock and save the order with its items in one go
+            try:
+                order = place_order(form, cart, cart_items)
+            except OutOfStock as exc:
+                _notify_out_of_stock(request, exc)
+                return redirect('cart:cart_detail')
+            except RedemptionLimitReached as exc:
+                _notify_coupon_used_up(request, exc)
+                return redirect('cart:cart_detail')
+
+            # 2. Clear the session cart
             cart.clear()
 
-            # 4. Launch asynchronous task to send confirmation email
-            order_created.delay(order.id)
+            # 3. Queue the confirmation email for the batched mail dispatcher
+            queue_emails([order_created_email(order)])
 
-            # 5. Set order ID in session and redirect to payment processing
+            # 4. Set order ID in session and redirect to payment processing
             request.session['order_id'] = order.id
             return redirect('payment:process')
     else:
@@ -88,34 +150,54 @@ def order_create(request):
 def admin_order_detail(request, order_id):
     """
     Displays the detailed view of an order for staff members only.
+    Archived orders are shown from the archive tables.
     """
-    order = get_object_or_404(Order, id=order_id)
+    order = get_order_or_archived(order_id)
     return render(
         request,
         'admin/orders/order/detail.html', 
-        {'order': order}
+        {'order': order, 'opts': order._meta}
     )
 
 
 @staff_member_required
 def admin_order_pdf(request, order_id):
     """
-    Generates and returns a PDF invoice for a specific order.
-    Utilizes WeasyPrint for HTML-to-PDF conversion.
-    """
-    order = get_object_or_404(Order, id=order_id)
-    
-    # Render the PDF template to a string
-    html = render_to_string('orders/order/pdf.html', {'order': order})
-    
-    # Prepare HTTP response with PDF content type
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'filename=order_{order.id}.pdf'
-    
-    # Generate PDF from HTML and write to response
-    weasyprint.HTML(string=html).write_pdf(
-        response,
-        stylesheets=[weasyprint.CSS(finders.find('shop/css/pdf.css'))]
-    )
-    
+    Returns the PDF invoice for a specific order.
+    The invoice is rendered only once per order version and served from
+    private storage; browsers revalidate it with its ETag.
+    Archived orders keep their id, so their invoice stays the same.
+    """
+    order = get_order_or_archived(order_id)
+
+    etag = f'"{get_invoice_key(order)}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(
+            private_storage().open(get_invoice(order), 'rb'),
+            content_type='application/pdf'
+        )
+        response['Content-Disposition'] = f'filename=order_{order.id}.pdf'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
     return response
+
+
+@staff_member_required
+def admin_order_export_download(request, export_id):
+    """
+    Serves a finished background order export to staff members.
+    """
+    export = get_object_or_404(OrderExport, id=export_id)
+    if export.status != OrderExport.Status.DONE or not export.file:
+        raise Http404('Export is not ready.')
+    return FileResponse(
+        export.file.open('rb'),
+        as_attachment=True,
+        filename=export.get_download_name(),
+        content_type=(
+            'application/zip' if export.export_format == OrderExport.Format.INVOICES
+            else 'application/gzip'
+        )
+    )
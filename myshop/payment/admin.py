@@ -1,3 +1,44 @@
-from django.contrib import admin
+"""
+Admin configuration for the payment application.
+Lists stored Stripe webhook events and lets staff reprocess failed ones.
+"""
 
-# Register your models here.
+from django.contrib import admin, messages
+
+from .models import StripeCoupon, StripeEvent
+from .tasks import process_stripe_event
+
+
+@admin.action(description='Reprocess selected failed events')
+def reprocess_events(modeladmin, request, queryset):
+    event_pks = list(
+        queryset.filter(status=StripeEvent.Status.FAILED).values_list('pk', flat=True)
+    )
+    for event_pk in event_pks:
+        process_stripe_event.delay(event_pk)
+    modeladmin.message_user(
+        request,
+        f'{len(event_pks)} events queued for processing.',
+        messages.SUCCESS
+    )
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ['event_id', 'type', 'status', 'attempts', 'received', 'processed']
+    list_filter = ['status', 'type']
+    search_fields = ['event_id']
+    readonly_fields = [
+        'event_id', 'type', 'payload', 'status', 'attempts',
+        'error', 'received', 'claimed', 'processed'
+    ]
+    actions = [reprocess_events]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(StripeCoupon)
+class StripeCouponAdmin(admin.ModelAdmin):
+    list_display = ['code', 'percent_off', 'stripe_id', 'created']
+    search_fields = ['code', 'stripe_id']
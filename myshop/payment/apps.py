@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class PaymentConfig(AppConfig):
     name = 'payment'
+
+    def ready(self):
+        from .stripe_client import configure_stripe
+        configure_stripe()
@@ -0,0 +1,43 @@
+"""
+Stripe coupons for shop coupons.
+
+Each (coupon code, discount) pair is created in Stripe once, on the first
+checkout that needs it, and its Stripe id is kept in StripeCoupon so later
+checkouts make no coupon API calls.
+"""
+
+import stripe
+
+from .models import StripeCoupon
+
+
+def get_stripe_coupon_id(code, percent_off):
+    """
+    Return the id of the Stripe coupon for a code and discount, creating
+    it in Stripe if it does not exist yet.
+    """
+    mapping = StripeCoupon.objects.filter(code=code, percent_off=percent_off).first()
+    if mapping is not None:
+        return mapping.stripe_id
+
+    stripe_coupon = stripe.Coupon.create(
+        name=code,
+        percent_off=percent_off,
+        duration='once',
+    )
+    # A concurrent checkout may have stored its coupon first; use that one
+    mapping, _ = StripeCoupon.objects.get_or_create(
+        code=code,
+        percent_off=percent_off,
+        defaults={'stripe_id': stripe_coupon.id}
+    )
+    return mapping.stripe_id
+
+
+def refresh_stripe_coupon_id(code, percent_off):
+    """
+    Forget the stored Stripe coupon for a code and discount (e.g. because
+    it was deleted in Stripe) and create a new one.
+    """
+    StripeCoupon.objects.filter(code=code, percent_off=percent_off).delete()
+    return get_stripe_coupon_id(code, percent_off)
@@ -0,0 +1,209 @@
+"""
+Processing of stored Stripe webhook events.
+
+The webhook only verifies and stores events; the work they trigger runs
+here, in a Celery worker. An event is claimed with a conditional UPDATE
+before it is processed, so duplicate deliveries, retries and requeues
+never process it twice. A claim held longer than
+STRIPE_EVENT_CLAIM_TIMEOUT seconds belongs to a worker that died, and the
+event may be claimed again.
+"""
+
+import logging
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from analytics.tasks import update_sales_rollups
+from orders.fulfillment import log_transitions
+from orders.models import Order, OrderItem
+from orders.reservations import confirm_reservations, release_reservations
+from shop.models import Product
+from shop.recommender import Recommender
+from .models import StripeEvent
+from .sessions import SESSION_FIELDS, clear_session_fields
+from .tasks import payment_completed, refund_payments
+
+logger = logging.getLogger(__name__)
+
+
+def mark_orders_paid(payments):
+    """
+    Mark unpaid orders as paid in bulk and start their post-payment
+    workflow. `payments` maps order ids to Stripe Payment Intent ids.
+
+    The orders are locked while they are marked, so an order reported by
+    both the webhook and the reconciliation job is handled only once.
+    Orders cancelled before their payment arrived keep their status and
+    released stock and their payment is refunded.
+    Returns the ids of the orders marked as paid.
+    """
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update().filter(id__in=payments, paid=False)
+        )
+        if not orders:
+            return []
+        pending = [order for order in orders if order.status == Order.Status.PENDING]
+        cancelled = [order for order in orders if order.status != Order.Status.PENDING]
+
+        # Keep the reserved stock, mark the orders as paid and store the
+        # Stripe Payment Intent IDs
+        confirm_reservations(pending)
+        now = timezone.now()
+        for order in orders:
+            order.paid = True
+            order.stripe_id = payments[order.id] or ''
+            order.updated = now
+            clear_session_fields(order)
+        for order in pending:
+            order.status = Order.Status.PAID
+            order.status_changed = now
+        for order in cancelled:
+            logger.warning('Order %s was paid after it was cancelled, refunding', order.id)
+        Order.objects.bulk_update(
+            orders,
+            [
+                'paid', 'stripe_id', 'updated', 'reserved_until',
+                'status', 'status_changed', *SESSION_FIELDS
+            ]
+        )
+        log_transitions(
+            [(order.id, Order.Status.PENDING) for order in pending],
+            Order.Status.PAID,
+            now,
+            note='Stripe payment'
+        )
+        if cancelled:
+            refund_ids = [order.id for order in cancelled]
+            transaction.on_commit(lambda: refund_payments.delay(refund_ids))
+
+        # Send the invoices and add the orders to the daily sales rollups
+        # once the paid flag is committed, so they are queued exactly when
+        # the orders become paid, whatever happens afterwards
+        order_ids = [order.id for order in pending]
+        if order_ids:
+            transaction.on_commit(lambda: payment_completed.delay(order_ids))
+            transaction.on_commit(lambda: update_sales_rollups.delay(order_ids))
+    if not order_ids:
+        return []
+
+    # Recommendations are best effort: a Redis failure must not fail the
+    # event, which would never see these orders unpaid again
+    try:
+        record_bought_products(order_ids)
+    except Exception:
+        logger.exception('Updating recommendations for orders %s failed', order_ids)
+    return order_ids
+
+
+def record_bought_products(order_ids):
+    """
+    Save the items bought together in the given orders for product
+    recommendations.
+    """
+    bought = {}
+    for order_id, product_id in OrderItem.objects.filter(
+        order_id__in=order_ids
+    ).values_list('order_id', 'product_id'):
+        bought.setdefault(order_id, []).append(product_id)
+    products = Product.objects.in_bulk(
+        [product_id for product_ids in bought.values() for product_id in product_ids]
+    )
+    r = Recommender()
+    for product_ids in bought.values():
+        r.product_bought([products[product_id] for product_id in product_ids])
+
+
+def handle_checkout_completed(session):
+    """
+    Mark the order of a paid Checkout session as paid and start the
+    post-payment workflow.
+    """
+    # Verify that the session completed with a successful payment
+    if session.mode != 'payment' or session.payment_status != 'paid':
+        return
+    mark_orders_paid({int(session.client_reference_id): session.payment_intent})
+
+
+def handle_checkout_expired(session):
+    """
+    The customer never paid: give the reserved stock back.
+    Sessions replaced by a newer one of the same order expire without
+    releasing the stock, which the newer session still holds.
+    """
+    orders = Order.objects.filter(id=session.client_reference_id).filter(
+        Q(stripe_session_id='') | Q(stripe_session_id=session.id)
+    )
+    release_reservations(orders)
+    orders.update(
+        stripe_session_id='',
+        stripe_session_url='',
+        stripe_session_expires=None,
+        stripe_session_fingerprint=''
+    )
+
+
+EVENT_HANDLERS = {
+    'checkout.session.completed': handle_checkout_completed,
+    'checkout.session.expired': handle_checkout_expired,
+}
+
+
+def stale_claims(now):
+    """
+    Events left processing by a worker that died.
+    """
+    cutoff = now - timedelta(seconds=settings.STRIPE_EVENT_CLAIM_TIMEOUT)
+    return Q(status=StripeEvent.Status.PROCESSING) & (
+        Q(claimed__lt=cutoff) | Q(claimed__isnull=True)
+    )
+
+
+def claimable_events(now):
+    return Q(status__in=[StripeEvent.Status.PENDING, StripeEvent.Status.FAILED]) | stale_claims(now)
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=settings.STRIPE_EVENT_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def process_event(event_pk):
+    """
+    Process a stored event. Returns False if the event was already
+    processed or is being processed by another worker.
+    """
+    now = timezone.now()
+    claimed = StripeEvent.objects.filter(
+        claimable_events(now),
+        pk=event_pk
+    ).update(
+        status=StripeEvent.Status.PROCESSING,
+        attempts=F('attempts') + 1,
+        claimed=now
+    )
+    if not claimed:
+        return False
+
+    stored = StripeEvent.objects.get(pk=event_pk)
+    event = stripe.Event.construct_from(stored.payload, stripe.api_key)
+    handler = EVENT_HANDLERS.get(event.type)
+    try:
+        if handler is not None:
+            handler(event.data.object)
+    except Exception as exc:
+        logger.exception('Processing Stripe event %s failed', stored.event_id)
+        stored.status = StripeEvent.Status.FAILED
+        stored.error = repr(exc)
+        stored.save(update_fields=['status', 'error'])
+        raise
+
+    stored.status = StripeEvent.Status.PROCESSED
+    stored.error = ''
+    stored.processed = timezone.now()
+    stored.save(update_fields=['status', 'error', 'processed'])
+    return True
@@ -0,0 +1,27 @@
+"""
+Mark as paid the orders paid in Stripe whose webhook never arrived.
+
+Usage:
+    python manage.py reconcile_payments
+    python manage.py reconcile_payments --hours 48
+"""
+
+from django.core.management.base import BaseCommand
+
+from payment.reconciliation import reconcile_payments
+
+
+class Command(BaseCommand):
+    help = 'Reconcile unpaid orders with the Checkout sessions paid in Stripe.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=None,
+            help='How far back to look (defaults to PAYMENT_RECONCILIATION_HOURS).'
+        )
+
+    def handle(self, *args, **options):
+        order_ids = reconcile_payments(options['hours'])
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {len(order_ids)} orders'))
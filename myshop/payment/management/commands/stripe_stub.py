@@ -0,0 +1,383 @@
+"""
+Local stand-in for the parts of the Stripe API used by the shop, to run
+and load-test the payment path without network access.
+
+Endpoints:
+    POST /v1/coupons
+    POST /v1/checkout/sessions
+    GET  /v1/checkout/sessions               (limit, starting_after, status, created[gte])
+    GET  /v1/checkout/sessions/<id>
+    POST /v1/checkout/sessions/<id>/expire
+    POST /v1/refunds
+    GET  /pay/<id>                           (the customer pays the session)
+
+Paying or expiring a session delivers a checkout.session.completed or
+checkout.session.expired event to the webhook URL, signed with
+STRIPE_WEBHOOK_SECRET like Stripe does.
+
+Usage:
+    python manage.py stripe_stub
+    python manage.py stripe_stub --port 12111 --auto-pay --pay-delay 2
+and run the shop with STRIPE_API_BASE=http://127.0.0.1:12111.
+"""
+
+import hashlib
+import hmac
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def parse_form(body):
+    """
+    Decode Stripe's form encoding (line_items[0][quantity]=2) into nested
+    dicts and lists.
+    """
+    data = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        parts = re.findall(r'[^\[\]]+', key)
+        node = data
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+    return _to_lists(data)
+
+
+def _to_lists(node):
+    if not isinstance(node, dict):
+        return node
+    node = {key: _to_lists(value) for key, value in node.items()}
+    if node and all(key.isdigit() for key in node):
+        return [node[key] for key in sorted(node, key=int)]
+    return node
+
+
+def sign_payload(payload, secret, timestamp):
+    signature = hmac.new(
+        secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256
+    ).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+class StubError(Exception):
+    def __init__(self, status, message, code='resource_missing', param=None):
+        super().__init__(message)
+        self.status = status
+        self.body = {'error': {
+            'type': 'invalid_request_error',
+            'code': code,
+            'param': param,
+            'message': message,
+        }}
+
+
+class StubStripe:
+    """
+    In-memory state of the stand-in: coupons, sessions and webhook delivery.
+    """
+    def __init__(self, base_url, webhook_url, webhook_secret, auto_pay=False, pay_delay=0):
+        self.base_url = base_url
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.auto_pay = auto_pay
+        self.pay_delay = pay_delay
+        self.coupons = {}
+        self.sessions = {}
+        self.refunds = {}
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+
+    def new_id(self, prefix):
+        return f'{prefix}_stub_{next(self.ids)}'
+
+    def create_coupon(self, data):
+        coupon = {
+            'id': self.new_id('co'),
+            'object': 'coupon',
+            'name': data.get('name'),
+            'percent_off': float(data.get('percent_off', 0)),
+            'duration': data.get('duration', 'once'),
+            'valid': True,
+        }
+        with self.lock:
+            self.coupons[coupon['id']] = coupon
+        return coupon
+
+    def create_refund(self, data):
+        payment_intent = data.get('payment_intent')
+        with self.lock:
+            paid = any(
+                session['payment_intent'] == payment_intent
+                for session in self.sessions.values()
+            )
+            if not paid:
+                raise StubError(
+                    400, f"No such payment_intent: '{payment_intent}'", param='payment_intent'
+                )
+            refund = {
+                'id': self.new_id('re'),
+                'object': 'refund',
+                'payment_intent': payment_intent,
+                'status': 'succeeded',
+            }
+            self.refunds[refund['id']] = refund
+        return refund
+
+    def create_session(self, data):
+        line_items = data.get('line_items', [])
+        subtotal = sum(
+            int(item['price_data']['unit_amount']) * int(item.get('quantity', 1))
+            for item in line_items
+        )
+        percent_off = 0
+        for discount in data.get('discounts', []):
+            coupon = self.coupons.get(discount.get('coupon'))
+            if coupon is None:
+                raise StubError(
+                    400, f"No such coupon: '{discount.get('coupon')}'", param='discounts'
+                )
+            percent_off = coupon['percent_off']
+
+        now = int(time.time())
+        session_id = self.new_id('cs_test')
+        session = {
+            'id': session_id,
+            'object': 'checkout.session',
+            'url': f'{self.base_url}/pay/{session_id}',
+            'mode': data.get('mode', 'payment'),
+            'client_reference_id': data.get('client_reference_id'),
+            'success_url': data.get('success_url'),
+            'cancel_url': data.get('cancel_url'),
+            'created': now,
+            'expires_at': int(data.get('expires_at') or now + 24 * 3600),
+            'status': 'open',
+            'payment_status': 'unpaid',
+            'payment_intent': None,
+            'currency': 'usd',
+            'amount_subtotal': subtotal,
+            'amount_total': round(subtotal * (100 - percent_off) / 100),
+            'livemode': False,
+        }
+        with self.lock:
+            self.sessions[session_id] = session
+        if self.auto_pay:
+            threading.Timer(self.pay_delay, self.pay_session, [session_id]).start()
+        return session
+
+    def get_session(self, session_id):
+        with self.lock:
+            session = self.sessions.get(session_id)
+        if session is None:
+            raise StubError(404, f"No such checkout.session: '{session_id}'", param='id')
+        if session['status'] == 'open' and session['expires_at'] <= time.time():
+            try:
+                self.expire_session(session_id)
+            except StubError:
+                # Paid or expired in the meantime
+                pass
+        return session
+
+    def list_sessions(self, params):
+        limit = min(int(params.get('limit', 10)), 100)
+        created_gte = int(params.get('created[gte]', 0))
+        with self.lock:
+            sessions = sorted(
+                self.sessions.values(),
+                key=lambda session: (session['created'], session['id']),
+                reverse=True
+            )
+        sessions = [s for s in sessions if s['created'] >= created_gte]
+        if params.get('status'):
+            sessions = [s for s in sessions if s['status'] == params['status']]
+        if params.get('starting_after'):
+            ids = [s['id'] for s in sessions]
+            if params['starting_after'] in ids:
+                sessions = sessions[ids.index(params['starting_after']) + 1:]
+        return {
+            'object': 'list',
+            'url': '/v1/checkout/sessions',
+            'data': sessions[:limit],
+            'has_more': len(sessions) > limit,
+        }
+
+    def pay_session(self, session_id):
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None or session['status'] != 'open':
+                return session
+            session.update(
+                status='complete',
+                payment_status='paid',
+                payment_intent=self.new_id('pi'),
+            )
+        self.deliver('checkout.session.completed', session)
+        return session
+
+    def expire_session(self, session_id):
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                raise StubError(404, f"No such checkout.session: '{session_id}'", param='id')
+            if session['status'] != 'open':
+                raise StubError(
+                    400,
+                    'Only Checkout Sessions with a status of open can be expired.',
+                    code='checkout_session_not_open'
+                )
+            session['status'] = 'expired'
+        self.deliver('checkout.session.expired', session)
+        return session
+
+    def deliver(self, event_type, session):
+        """
+        Send a signed webhook event in the background, retrying a few times.
+        """
+        event = {
+            'id': self.new_id('evt'),
+            'object': 'event',
+            'type': event_type,
+            'created': int(time.time()),
+            'livemode': False,
+            'data': {'object': dict(session)},
+        }
+        threading.Thread(target=self._post_event, args=[event], daemon=True).start()
+
+    def _post_event(self, event):
+        payload = json.dumps(event)
+        for attempt in range(3):
+            headers = {
+                'Content-Type': 'application/json',
+                'Stripe-Signature': sign_payload(
+                    payload, self.webhook_secret, int(time.time())
+                ),
+            }
+            try:
+                response = requests.post(
+                    self.webhook_url, data=payload, headers=headers, timeout=10
+                )
+                if response.status_code < 500:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(2 ** attempt)
+
+
+def make_handler(stub, log):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = dict(parse_qsl(url.query))
+            self._dispatch([
+                (r'/v1/checkout/sessions', lambda: stub.list_sessions(params)),
+                (r'/v1/checkout/sessions/(?P<id>[^/]+)', stub.get_session),
+                (r'/pay/(?P<id>[^/]+)', self._pay),
+            ], url.path)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            data = parse_form(self.rfile.read(length).decode())
+            self._dispatch([
+                (r'/v1/coupons', lambda: stub.create_coupon(data)),
+                (r'/v1/refunds', lambda: stub.create_refund(data)),
+                (r'/v1/checkout/sessions', lambda: stub.create_session(data)),
+                (r'/v1/checkout/sessions/(?P<id>[^/]+)/expire', stub.expire_session),
+            ], urlsplit(self.path).path)
+
+        def _dispatch(self, routes, path):
+            for pattern, view in routes:
+                match = re.fullmatch(pattern, path)
+                if match:
+                    try:
+                        self._send(200, view(*match.groups()))
+                    except StubError as e:
+                        self._send(e.status, e.body)
+                    return
+            self._send(404, StubError(404, f'Unrecognized request URL: {path}').body)
+
+        def _pay(self, session_id):
+            session = stub.get_session(session_id)
+            if session['status'] == 'open':
+                stub.pay_session(session_id)
+            elif session['status'] == 'expired':
+                raise StubError(410, 'This checkout session has expired.')
+            self.send_response(303)
+            self.send_header('Location', session['success_url'])
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def _send(self, status, body):
+            if body is None:
+                return
+            content = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            log(format % args)
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = 'Run a local stand-in for the Stripe API with signed webhook delivery.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=12111)
+        parser.add_argument(
+            '--webhook-url',
+            default=None,
+            help='Where to deliver events (defaults to SITE_URL/payment/webhook/).'
+        )
+        parser.add_argument(
+            '--auto-pay',
+            action='store_true',
+            help='Pay every new checkout session automatically.'
+        )
+        parser.add_argument(
+            '--pay-delay',
+            type=float,
+            default=0,
+            help='Seconds to wait before an automatic payment.'
+        )
+
+    def handle(self, *args, **options):
+        base_url = f'http://{options["host"]}:{options["port"]}'
+        webhook_url = options['webhook_url'] or f'{settings.SITE_URL}/payment/webhook/'
+        stub = StubStripe(
+            base_url,
+            webhook_url,
+            settings.STRIPE_WEBHOOK_SECRET,
+            auto_pay=options['auto_pay'],
+            pay_delay=options['pay_delay'],
+        )
+
+        def log(message):
+            if options['verbosity'] > 1:
+                self.stdout.write(message)
+
+        server = ThreadingHTTPServer(
+            (options['host'], options['port']), make_handler(stub, log)
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Stripe stand-in listening on {base_url}, delivering webhooks to {webhook_url}'
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
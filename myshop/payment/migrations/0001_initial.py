@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=255, unique=True)),
+                ('type', models.CharField(max_length=100)),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('processed', 'Processed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('received', models.DateTimeField(auto_now_add=True)),
+                ('processed', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-received'],
+                'indexes': [models.Index(fields=['status', 'received'], name='payment_str_status_da4b4a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeCoupon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=50)),
+                ('percent_off', models.IntegerField()),
+                ('stripe_id', models.CharField(max_length=255)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('code', 'percent_off'), name='unique_stripe_coupon')],
+            },
+        ),
+    ]
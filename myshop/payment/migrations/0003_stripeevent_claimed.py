@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0002_stripecoupon'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stripeevent',
+            name='claimed',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,2 +1,72 @@
+"""
+Models for the payment application.
+Stores received Stripe webhook events so they are processed exactly once,
+outside the webhook request.
+"""
 from django.db import models
 
+# ==============================================================================
+# STRIPE EVENTS
+# ==============================================================================
+
+class StripeEvent(models.Model):
+    """
+    A verified Stripe webhook event waiting for or done with processing.
+    The unique event id turns duplicate deliveries into no-ops.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        PROCESSING = 'processing', 'Processing'
+        PROCESSED = 'processed', 'Processed'
+        FAILED = 'failed', 'Failed'
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    received = models.DateTimeField(auto_now_add=True)
+    # When a worker last claimed the event
+    claimed = models.DateTimeField(null=True, blank=True)
+    processed = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-received']
+        indexes = [
+            models.Index(fields=['status', 'received']),
+        ]
+
+    def __str__(self):
+        return f'{self.type} {self.event_id}'
+
+
+# ==============================================================================
+# STRIPE COUPONS
+# ==============================================================================
+
+class StripeCoupon(models.Model):
+    """
+    Stripe coupon created for a coupon code and discount, reused by every
+    checkout with that code and discount. A changed discount maps to a
+    new Stripe coupon.
+    """
+    code = models.CharField(max_length=50)
+    percent_off = models.IntegerField()
+    stripe_id = models.CharField(max_length=255)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['code', 'percent_off'],
+                name='unique_stripe_coupon'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.code} ({self.percent_off}% off)'
@@ -0,0 +1,53 @@
+"""
+Reconciliation of payments whose webhook was lost.
+
+Completed Checkout sessions of the last few hours are listed from Stripe
+in pages of 100 (one API call per page) and matched against unpaid orders
+in a single query. Orders found paid in Stripe go through the same bulk
+post-payment workflow as the webhook.
+"""
+
+import logging
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.utils import timezone
+
+from .events import mark_orders_paid
+
+logger = logging.getLogger(__name__)
+
+
+def paid_sessions(since):
+    """
+    Yield the paid Checkout sessions created since the given moment.
+    """
+    sessions = stripe.checkout.Session.list(
+        status='complete',
+        created={'gte': int(since.timestamp())},
+        limit=100,
+    )
+    for session in sessions.auto_paging_iter():
+        if session.mode == 'payment' and session.payment_status == 'paid':
+            yield session
+
+
+def reconcile_payments(hours=None):
+    """
+    Mark as paid the orders whose Checkout session was paid in the last
+    `hours` (settings.PAYMENT_RECONCILIATION_HOURS by default) but which
+    are still unpaid here. Returns the ids of the reconciled orders.
+    """
+    hours = hours or settings.PAYMENT_RECONCILIATION_HOURS
+    since = timezone.now() - timedelta(hours=hours)
+
+    payments = {}
+    for session in paid_sessions(since):
+        if session.client_reference_id and session.client_reference_id.isdigit():
+            payments[int(session.client_reference_id)] = session.payment_intent
+
+    order_ids = mark_orders_paid(payments) if payments else []
+    if order_ids:
+        logger.warning('Marked %d orders paid that were missed by the webhook', len(order_ids))
+    return order_ids
@@ -0,0 +1,87 @@
+"""
+Reuse of Stripe Checkout sessions.
+
+The open session of an order is stored on it together with a fingerprint
+of what it charges. Repeated payment attempts (double clicks, returning
+from the cancel page) are sent back to that session while it is open and
+the order is unchanged, instead of creating a new one.
+"""
+
+import datetime
+import hashlib
+import json
+
+import stripe
+from django.utils import timezone
+
+# Minimum time left on a stored session for it to be reused
+MIN_SESSION_TIME_LEFT = datetime.timedelta(minutes=5)
+
+SESSION_FIELDS = [
+    'stripe_session_id',
+    'stripe_session_url',
+    'stripe_session_expires',
+    'stripe_session_fingerprint',
+]
+
+
+def session_fingerprint(session_data):
+    """
+    Hash of the line items and discounts of Checkout session data.
+    """
+    charged = {
+        'line_items': session_data['line_items'],
+        'discounts': session_data.get('discounts', []),
+    }
+    return hashlib.sha256(
+        json.dumps(charged, sort_keys=True).encode()
+    ).hexdigest()
+
+
+def get_open_session_url(order, fingerprint):
+    """
+    URL of the order's stored session if it can still be used to pay for
+    the same contents, else None.
+    """
+    if (
+        order.stripe_session_id
+        and order.stripe_session_fingerprint == fingerprint
+        and order.stripe_session_expires is not None
+        and order.stripe_session_expires > timezone.now() + MIN_SESSION_TIME_LEFT
+    ):
+        return order.stripe_session_url
+    return None
+
+
+def expire_session(order):
+    """
+    Expire the order's stored session in Stripe so it can no longer be
+    paid, e.g. after the order contents changed.
+    """
+    if not order.stripe_session_id:
+        return
+    try:
+        stripe.checkout.Session.expire(order.stripe_session_id)
+    except stripe.error.InvalidRequestError:
+        # Already expired or completed
+        pass
+
+
+def store_session(order, session, fingerprint):
+    order.stripe_session_id = session.id
+    order.stripe_session_url = session.url
+    order.stripe_session_expires = datetime.datetime.fromtimestamp(
+        session.expires_at, tz=datetime.timezone.utc
+    )
+    order.stripe_session_fingerprint = fingerprint
+    order.save(update_fields=SESSION_FIELDS)
+
+
+def clear_session_fields(order):
+    """
+    Forget the stored session in memory; the caller saves the order.
+    """
+    order.stripe_session_id = ''
+    order.stripe_session_url = ''
+    order.stripe_session_expires = None
+    order.stripe_session_fingerprint = ''
@@ -0,0 +1,89 @@
+"""
+Stripe API client configuration.
+
+All Stripe calls go through one HTTP client that keeps a pool of
+keep-alive connections, uses explicit connect/read timeouts, retries
+failed requests a bounded number of times and records the latency of
+every attempt in a Prometheus histogram.
+
+The API base URL is configurable, so the payment path can run against the
+local stand-in server (python manage.py stripe_stub) instead of Stripe.
+"""
+
+import re
+import time
+
+import requests
+import stripe
+from django.conf import settings
+from prometheus_client import Histogram
+from requests.adapters import HTTPAdapter
+
+STRIPE_REQUEST_SECONDS = Histogram(
+    'stripe_request_duration_seconds',
+    'Latency of Stripe API requests, per attempt.',
+    ['method', 'endpoint', 'status'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+
+# Object ids in request paths, e.g. cs_test_a1B2 or pi_3Ab; resource names
+# such as payment_intents have no digits or capitals
+_OBJECT_ID = re.compile(r'/[a-z]+_[A-Za-z0-9_]*[A-Z0-9][A-Za-z0-9_]*')
+
+
+def endpoint_label(url):
+    """
+    Request path with object ids replaced, to keep label cardinality low.
+    """
+    path = url.split('://', 1)[-1].split('/', 1)[-1].split('?', 1)[0]
+    return _OBJECT_ID.sub('/{id}', '/' + path)
+
+
+class InstrumentedRequestsClient(stripe.RequestsClient):
+    """
+    Stripe HTTP client timing each request attempt.
+    """
+    def request(self, method, url, headers, post_data=None):
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            content, status, response_headers = super().request(
+                method, url, headers, post_data
+            )
+            return content, status, response_headers
+        finally:
+            STRIPE_REQUEST_SECONDS.labels(
+                method=method.upper(),
+                endpoint=endpoint_label(url),
+                status=str(status),
+            ).observe(time.perf_counter() - start)
+
+
+def build_http_client():
+    """
+    HTTP client with a shared keep-alive connection pool. Retries are left
+    to the Stripe library, which only retries requests safe to repeat.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.STRIPE_POOL_SIZE,
+        max_retries=0,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return InstrumentedRequestsClient(
+        timeout=settings.STRIPE_TIMEOUT,
+        session=session,
+    )
+
+
+def configure_stripe():
+    """
+    Point the Stripe library at the configured API and HTTP client.
+    Called once at startup from PaymentConfig.ready().
+    """
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    stripe.api_base = settings.STRIPE_API_BASE
+    stripe.max_network_retries = settings.STRIPE_MAX_NETWORK_RETRIES
+    stripe.default_http_client = build_http_client()
@@ -1,56 +1,147 @@
 """
 Asynchronous tasks for the payment application.
-Handles post-payment actions like generating invoices and sending emails.
+Handles Stripe webhook events and post-payment actions like generating
+invoices and queueing their emails.
 """
 
-from io import BytesIO
-import weasyprint
+from datetime import timedelta
+
+import stripe
 from celery import shared_task
 
 # Django imports
-from django.contrib.staticfiles import finders
-from django.core.mail import EmailMessage
-from django.template.loader import render_to_string
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
 
 # Local imports
+from mailer.dispatcher import queue_emails
+from mailer.models import OutgoingEmail
+from orders.invoices import get_invoice, with_invoice_data
 from orders.models import Order
+from .models import StripeEvent
 
 @shared_task
-def payment_completed(order_id):
-    """
-    Task to send an e-mail notification with a PDF invoice 
-    when an order is successfully paid.
-    """
-    # 1. Retrieve the order object
-    order = Order.objects.get(id=order_id)
-    
-    # 2. Initialize the email message
-    subject = f'My shop - Invoice no. {order.id}'
-    message = 'Please find attached the invoice for your recent purchase.'
-    email = EmailMessage(
-        subject,
-        message,
-        'admin@myshop.com',
-        [order.email]
-    )
-    
-    # 3. Generate the PDF invoice
-    # Render the HTML template with order data
-    html = render_to_string('orders/order/pdf.html', {'order': order})
-    out = BytesIO()
-    
-    # Locate the CSS file for styling the PDF
-    stylesheets = [weasyprint.CSS(finders.find('shop/css/pdf.css'))]
-    
-    # Convert HTML string to a PDF file in memory (BytesIO)
-    weasyprint.HTML(string=html).write_pdf(out, stylesheets=stylesheets)
-    
-    # 4. Attach the generated PDF to the email
-    email.attach(
-        f'order_{order.id}.pdf',
-        out.getvalue(),
-        'application/pdf'
+def payment_completed(order_ids):
+    """
+    Task to queue the e-mails with the PDF invoices of a batch of orders
+    that were just paid.
+    """
+    # 1. Retrieve the orders with everything the invoice template needs
+    orders = with_invoice_data(Order.objects.filter(id__in=order_ids))
+
+    # 2. Get each PDF invoice, rendering it only if this order version
+    # has not been rendered yet; the queue attaches a copy of it
+    emails = [
+        OutgoingEmail(
+            to=order.email,
+            subject=f'My shop - Invoice no. {order.id}',
+            body='Please find attached the invoice for your recent purchase.',
+            attachments=[{
+                'filename': f'order_{order.id}.pdf',
+                'path': get_invoice(order),
+                'mimetype': 'application/pdf',
+            }]
+        )
+        for order in orders
+    ]
+
+    # 3. Queue the e-mails for the batched mail dispatcher
+    queue_emails(emails)
+
+
+@shared_task
+def expire_checkout_sessions(session_ids):
+    """
+    Task to expire the Stripe Checkout sessions of cancelled orders so
+    they can no longer be paid.
+    """
+    for session_id in session_ids:
+        try:
+            stripe.checkout.Session.expire(session_id)
+        except stripe.error.InvalidRequestError:
+            # Already expired or completed
+            pass
+
+
+@shared_task(bind=True, max_retries=5)
+def refund_payments(self, order_ids):
+    """
+    Task to refund the payments of orders that were paid after they had
+    been cancelled. The order id is the idempotency key, so retries never
+    refund twice.
+    """
+    orders = Order.objects.filter(
+        id__in=order_ids,
+        status=Order.Status.CANCELLED,
+        paid=True,
+        stripe_refund_id=''
+    ).exclude(stripe_id='')
+    try:
+        for order in orders:
+            refund = stripe.Refund.create(
+                payment_intent=order.stripe_id,
+                idempotency_key=f'refund-order-{order.id}'
+            )
+            Order.objects.filter(id=order.id).update(stripe_refund_id=refund.id)
+    except stripe.error.StripeError as exc:
+        raise self.retry(exc=exc, countdown=60 * 2 ** self.request.retries)
+
+
+@shared_task(bind=True, max_retries=5)
+def process_stripe_event(self, event_pk):
+    """
+    Task to process a Stripe webhook event stored by the webhook.
+    Failed events are retried with an increasing delay.
+    """
+    # Imported here because the event handlers queue the tasks above
+    from .events import process_event
+
+    try:
+        process_event(event_pk)
+    except Exception as exc:
+        raise self.retry(exc=exc, countdown=60 * 2 ** self.request.retries)
+
+
+@shared_task
+def requeue_stripe_events():
+    """
+    Periodic task queueing stored events that were dropped along the way:
+    - events still pending a few minutes after they were received, e.g.
+      because the broker was down when the webhook tried to queue them
+    - events left processing by a worker that died
+    - failed events whose task ran out of retries, again after an
+      increasing delay, until STRIPE_EVENT_MAX_ATTEMPTS attempts
+    """
+    # Imported here because the event handlers queue the tasks in this module
+    from .events import retry_delay, stale_claims
+
+    now = timezone.now()
+    cutoff = now - timedelta(minutes=5)
+    event_pks = list(
+        StripeEvent.objects.filter(
+            Q(status=StripeEvent.Status.PENDING, received__lt=cutoff) | stale_claims(now)
+        ).values_list('pk', flat=True)
     )
-    
-    # 5. Send the email
-    email.send()
\ No newline at end of file
+    failed = StripeEvent.objects.filter(
+        status=StripeEvent.Status.FAILED,
+        attempts__lt=settings.STRIPE_EVENT_MAX_ATTEMPTS
+    ).values_list('pk', 'attempts', 'claimed')
+    event_pks += [
+        event_pk for event_pk, attempts, claimed in failed
+        if claimed is None or claimed + retry_delay(attempts) <= now
+    ]
+    for event_pk in event_pks:
+        process_stripe_event.delay(event_pk)
+
+
+@shared_task
+def reconcile_payments():
+    """
+    Periodic task marking as paid the orders whose payment webhook was
+    lost (see payment.reconciliation).
+    """
+    # Imported here because the event handlers queue the tasks above
+    from .reconciliation import reconcile_payments
+
+    return len(reconcile_payments())
@@ -1,15 +1,24 @@
+from datetime import timedelta
 from decimal import Decimal
 
 import stripe
-from django.conf import settings
+from django.contrib import messages
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext as _
 
 from orders.models import Order
-
-# create the stripe instance
-stripe.api_key = settings.STRIPE_SECRET_KEY
-# stripe.api_version = settings.STRIPE_API_VERSION
+from orders.reservations import reserve_order
+from shop.inventory import OutOfStock
+from .coupons import get_stripe_coupon_id, refresh_stripe_coupon_id
+from .sessions import (
+    expire_session,
+    get_open_session_url,
+    session_fingerprint,
+    store_session,
+)
 
 
 def payment_process(request):
@@ -18,72 +27,127 @@ def payment_process(request):
         return redirect('cart:cart_detail')
 
     order = get_object_or_404(Order, id=order_id)
+    if order.status == Order.Status.CANCELLED:
+        request.session.pop('order_id', None)
+        messages.error(request, _('This order has been cancelled.'))
+        return redirect('cart:cart_detail')
+    # One query: names come from the item snapshots, the product join is
+    # only needed for stock and images.
     order_items = list(order.items.select_related('product'))
     if not order_items:
         request.session.pop('order_id', None)
         return redirect('cart:cart_detail')
 
     if request.method == 'POST':
-        success_url = request.build_absolute_uri(reverse('payment:completed'))
-        cancel_url = request.build_absolute_uri(reverse('payment:canceled'))
-
-        # stripe checkout session data
-        session_data = {
-            'mode': 'payment',
-            'client_reference_id': order.id,
-            'success_url': success_url,
-            'cancel_url': cancel_url,
-            'line_items': [],
-        }
-
-        # add order items to the stripe checkout session
-        for item in order_items:
-            session_data['line_items'].append(
-                {
-                    'price_data': {
-                        'unit_amount': int(item.price * Decimal('100')),
-                        'currency': 'usd',
-                        'product_data': {
-                            'name': item.product.name,
-                        },
-                    },
-                    'quantity': item.quantity,
-                }
+        # The order row stays locked until the session is stored, so
+        # concurrent attempts (double clicks, two tabs) wait and then reuse
+        # the session instead of each opening one that can be paid
+        with transaction.atomic():
+            order = Order.objects.select_for_update().get(id=order.id)
+            if order.status == Order.Status.CANCELLED:
+                messages.error(request, _('This order has been cancelled.'))
+                return redirect('cart:cart_detail')
+            if order.paid:
+                return redirect('payment:completed')
+
+            if order.reserved_until is None:
+                # The reservation expired before payment started: reserve again.
+                try:
+                    reserve_order(
+                        order,
+                        [(item.product, item.quantity) for item in order_items]
+                    )
+                except OutOfStock:
+                    messages.error(
+                        request,
+                        _('Some products in your order are no longer in stock.')
+                    )
+                    return redirect('cart:cart_detail')
+                order.save(update_fields=['reserved_until'])
+
+            success_url = request.build_absolute_uri(reverse('payment:completed'))
+            cancel_url = request.build_absolute_uri(reverse('payment:canceled'))
+
+            # stripe checkout session data
+            session_data = {
+                'mode': 'payment',
+                'client_reference_id': order.id,
+                'success_url': success_url,
+                'cancel_url': cancel_url,
+                'line_items': [],
+            }
+
+            # Let the checkout session expire with the stock reservation
+            # (Stripe requires at least 30 minutes from now).
+            earliest_expiry = timezone.now() + timedelta(minutes=31)
+            session_data['expires_at'] = int(
+                max(order.reserved_until, earliest_expiry).timestamp()
             )
 
-        # add shipping only when it has a charge
-        if order.shipping_cost > 0:
-            session_data['line_items'].append(
-                {
-                    'price_data': {
-                        'unit_amount': int(order.shipping_cost * Decimal('100')),
-                        'currency': 'usd',
-                        'product_data': {
-                            'name': 'Shipping',
+            # add order items to the stripe checkout session
+            for item in order_items:
+                session_data['line_items'].append(
+                    {
+                        'price_data': {
+                            'unit_amount': int(item.price * Decimal('100')),
+                            'currency': 'usd',
+                            'product_data': {
+                                'name': item.product_name or item.product.name,
+                            },
                         },
-                    },
-                    'quantity': 1,
-                }
-            )
-
-        # Stripe payment mode requires at least one line item.
-        if not session_data['line_items']:
-            return redirect('cart:cart_detail')
-
-        if order.coupon:
-            stripe_coupon = stripe.Coupon.create(
-                name=order.coupon.code,
-                percent_off=order.discount,
-                duration='once',
-            )
-            session_data['discounts'] = [{'coupon': stripe_coupon.id}]
-
-        # create stripe checkout session
-        session = stripe.checkout.Session.create(**session_data)
-        # redirect to stripe payment form
-        return redirect(session.url, code=303)
-
-    return render(request, 'payment/process.html', {'order': order})
+                        'quantity': item.quantity,
+                    }
+                )
+
+            # add shipping only when it has a charge
+            if order.shipping_cost > 0:
+                session_data['line_items'].append(
+                    {
+                        'price_data': {
+                            'unit_amount': int(order.shipping_cost * Decimal('100')),
+                            'currency': 'usd',
+                            'product_data': {
+                                'name': 'Shipping',
+                            },
+                        },
+                        'quantity': 1,
+                    }
+                )
+
+            # Stripe payment mode requires at least one line item.
+            if not session_data['line_items']:
+                return redirect('cart:cart_detail')
+
+            if order.coupon:
+                stripe_coupon_id = get_stripe_coupon_id(order.coupon.code, order.discount)
+                session_data['discounts'] = [{'coupon': stripe_coupon_id}]
+
+            # send repeated attempts back to the open session of an unchanged order
+            session_url = get_open_session_url(order, session_fingerprint(session_data))
+            if session_url:
+                return redirect(session_url, code=303)
+            # the order changed: its old session must not be paid anymore
+            expire_session(order)
+
+            # create stripe checkout session
+            try:
+                session = stripe.checkout.Session.create(**session_data)
+            except stripe.error.InvalidRequestError as e:
+                # The stored Stripe coupon was deleted in Stripe: create it again
+                if not order.coupon or e.code != 'resource_missing':
+                    raise
+                stripe_coupon_id = refresh_stripe_coupon_id(order.coupon.code, order.discount)
+                session_data['discounts'] = [{'coupon': stripe_coupon_id}]
+                session = stripe.checkout.Session.create(**session_data)
+            store_session(order, session, session_fingerprint(session_data))
+            # redirect to stripe payment form
+            return redirect(session.url, code=303)
+
+    return render(
+        request,
+        'payment/process.html',
+        {'order': order, 'order_items': order_items}
+    )
 
 
 # view for payment success and cancel
@@ -39,11 +39,12 @@ class ProductAdmin(TranslatableAdmin):
         'slug',
         'price',
         'available',
+        'stock',
         'created',
         'updated'
     ]
     list_filter = ['available', 'created', 'updated']
-    list_editable = ['price', 'available']
+    list_editable = ['price', 'available', 'stock']
 
     def get_prepopulated_fields(self, request, obj=None):
         return  {'slug': ('name',)}
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Stock management for products.
+
+Stock is taken and given back with single conditional bulk UPDATE
+statements (``stock = stock - qty WHERE stock >= qty``), so concurrent
+checkouts on the same product never read-modify-write the stock count and
+never hold more than the row locks of one statement.
+Products with an empty ``stock`` are not tracked and are ignored.
+"""
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Product
+
+
+class OutOfStock(Exception):
+    """
+    Raised when one or more products do not have enough stock left.
+    """
+    def __init__(self, products):
+        self.products = products
+        super().__init__(
+            'Not enough stock for: ' + ', '.join(str(p.id) for p in products)
+        )
+
+
+def _quantity_case(quantities):
+    """
+    Build a CASE expression mapping each product id to its quantity.
+    """
+    return Case(
+        *[When(id=product_id, then=Value(quantity))
+          for product_id, quantity in quantities.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def reserve_stock(lines):
+    """
+    Take the quantities of the given (product, quantity) lines out of stock.
+
+    All tracked lines are decremented by one conditional UPDATE; if any of
+    them lacks stock nothing is changed and OutOfStock is raised listing
+    the products that fell short.
+    """
+    quantities = {}
+    for product, quantity in lines:
+        if product.stock is not None:
+            quantities[product.id] = quantities.get(product.id, 0) + quantity
+    if not quantities:
+        return
+
+    quantity = _quantity_case(quantities)
+    with transaction.atomic():
+        updated = Product.objects.filter(
+            id__in=sorted(quantities),
+            stock__isnull=False,
+            stock__gte=quantity,
+        ).update(stock=F('stock') - quantity)
+        if updated == len(quantities):
+            return
+        # Roll back the partial update
+        transaction.set_rollback(True)
+    # Report what was missing from the stock as it was before the update
+    short = [
+        product for product in Product.objects.filter(id__in=quantities)
+        if product.stock is not None and product.stock < quantities[product.id]
+    ]
+    raise OutOfStock(short)
+
+
+def restock(quantities):
+    """
+    Give the quantities of a {product_id: quantity} mapping back to stock
+    with a single UPDATE.
+    """
+    if not quantities:
+        return 0
+    return Product.objects.filter(
+        id__in=sorted(quantities),
+        stock__isnull=False,
+    ).update(stock=F('stock') + _quantity_case(quantities))
+
+
+def take_stock(quantities):
+    """
+    Take the quantities of a {product_id: quantity} mapping out of stock on
+    a best-effort basis, with one conditional UPDATE per product.
+
+    Products without enough stock are left unchanged; their ids are
+    returned.
+    """
+    short = []
+    for product_id in sorted(quantities):
+        updated = Product.objects.filter(
+            id=product_id,
+            stock__isnull=False,
+            stock__gte=quantities[product_id],
+        ).update(stock=F('stock') - quantities[product_id])
+        if not updated:
+            short.append(product_id)
+    return short
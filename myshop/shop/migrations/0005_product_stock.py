@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_product_weight'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock',
+            field=models.PositiveIntegerField(blank=True, help_text='units in stock; leave empty to not track stock', null=True),
+        ),
+    ]
@@ -71,6 +71,11 @@ class Product(TranslatableModel):
     # Financials & Status
     price = models.DecimalField(max_digits=10, decimal_places=2)
     available = models.BooleanField(default=True)
+    stock = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="units in stock; leave empty to not track stock"
+    )
     
     # Timestamps
     created = models.DateTimeField(auto_now_add=True)
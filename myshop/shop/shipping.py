@@ -0,0 +1,76 @@
+"""
+Shipping rate engine shared by the cart, orders and invoices.
+
+Rates are configured in settings.SHIPPING_RATES as (max weight in grams,
+cost) tiers sorted by weight; a tier with no maximum catches everything
+heavier. The table is precomputed once and looked up by bisection.
+"""
+
+from bisect import bisect_left
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import F, Sum
+from django.dispatch import receiver
+
+
+class ShippingRateTable:
+    """
+    Precomputed weight tiers with a bisection lookup.
+    """
+    def __init__(self, rates):
+        bounded = sorted(
+            (limit, Decimal(cost)) for limit, cost in rates if limit is not None
+        )
+        open_ended = [Decimal(cost) for limit, cost in rates if limit is None]
+
+        self.limits = [limit for limit, _ in bounded]
+        self.costs = [cost for _, cost in bounded]
+        self.overflow_cost = open_ended[0] if open_ended else self.costs[-1]
+
+    def cost_for(self, weight):
+        """
+        Return the shipping cost for a total weight in grams.
+        """
+        index = bisect_left(self.limits, weight)
+        if index < len(self.costs):
+            return self.costs[index]
+        return self.overflow_cost
+
+
+@lru_cache(maxsize=None)
+def get_rate_table():
+    return ShippingRateTable(settings.SHIPPING_RATES)
+
+
+@receiver(setting_changed)
+def _reset_rate_table(setting, **kwargs):
+    if setting == 'SHIPPING_RATES':
+        get_rate_table.cache_clear()
+
+
+def shipping_cost(weight):
+    """
+    Return the shipping cost for a total weight in grams.
+    """
+    return get_rate_table().cost_for(weight)
+
+
+def total_weight(lines):
+    """
+    Total weight in grams of (product, quantity) lines already in memory.
+    """
+    return sum(product.weight * quantity for product, quantity in lines)
+
+
+def items_weight(items):
+    """
+    Total weight in grams of an order items queryset, computed in the
+    database from the items' weight snapshots with a single aggregate query.
+    """
+    weight = items.aggregate(
+        weight=Sum(F('weight') * F('quantity'))
+    )['weight']
+    return weight or 0